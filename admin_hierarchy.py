@@ -0,0 +1,70 @@
+"""
+Administrative hierarchy of the Luzon regions covered by PinPoint.
+
+data/admin_hierarchy.csv maps every region (as named in the Wealth Indicator
+workbook) to its provinces and their GADM level-1 keys (GID_1, with the
+province name matching GADM NAME_1). It is loaded once per process and used
+to spread regional figures over provinces in a single vectorized merge.
+"""
+
+import pandas as pd
+import streamlit as st
+
+HIERARCHY_PATH = 'data/admin_hierarchy.csv'
+
+SPLIT = 'split'          # additive metric: divided evenly across the region's provinces
+BROADCAST = 'broadcast'  # rate or label: every province gets the regional value
+
+# Columns that are not split when a regional value is distributed to provinces
+ALLOCATION_RULES = {
+    'GDP Growth (%)': BROADCAST,
+    'Poverty Rate (%)': BROADCAST,
+}
+
+@st.cache_resource(show_spinner=False)
+def load_admin_hierarchy():
+    """
+    Region -> Province -> GID_1 table, one row per province
+    """
+    hierarchy = pd.read_csv(HIERARCHY_PATH)
+    hierarchy['Province Count'] = hierarchy.groupby('Region')['Province'].transform('size')
+    return hierarchy
+
+def region_provinces():
+    """
+    Mapping of each region to the list of its provinces
+    """
+    hierarchy = load_admin_hierarchy()
+    return hierarchy.groupby('Region', sort=False)['Province'].apply(list).to_dict()
+
+def luzon_provinces():
+    """
+    Every province in the hierarchy (named as in GADM NAME_1)
+    """
+    return load_admin_hierarchy()['Province'].tolist()
+
+def allocation_rule(df, column):
+    """
+    How a column is allocated from a region to its provinces
+    """
+    if column in ALLOCATION_RULES:
+        return ALLOCATION_RULES[column]
+    return SPLIT if pd.api.types.is_numeric_dtype(df[column]) else BROADCAST
+
+def distribute_to_provinces(region_df, region_column='Region'):
+    """
+    Expand regional rows to one row per province of that region
+
+    Additive metrics are divided by the region's province count and rates
+    are repeated, following ALLOCATION_RULES. Regions outside the hierarchy
+    are dropped.
+    """
+    hierarchy = load_admin_hierarchy()[['Region', 'Province', 'GID_1', 'Province Count']]
+    value_columns = [col for col in region_df.columns if col != region_column]
+
+    province_df = hierarchy.merge(region_df, left_on='Region', right_on=region_column, how='inner')
+
+    split_columns = [col for col in value_columns if allocation_rule(region_df, col) == SPLIT]
+    province_df[split_columns] = province_df[split_columns].div(province_df['Province Count'], axis=0)
+
+    return province_df[['Province', 'GID_1'] + value_columns]
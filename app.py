@@ -3,7 +3,19 @@ import streamlit as st
 from streamlit_option_menu import option_menu
 from ofw_popup_expansion_strategy import *
 from hero_product_mapping import *
-from branch import agentic_ai_branch_analyzer
+from branch import start_branch_analysis
+from data_store import load_table
+from remittance_query import query_remittances
+from boundary_cache import load_boundaries
+from establishments import select_establishments
+from wealth_dataset import load_wealth_dataset
+from wealth_scores import WEALTH_METRICS, wealth_scores
+from branch_cube import branch_cube_csv, get_bank_summary, get_branch_counts
+from spatial_index import competitor_proximity
+from branch_map import RENDER_MODES, build_branch_map, format_render_stats
+from forecasters import FORECASTERS
+from llm_gateway import format_llm_metrics, llm_metrics
+from llm_providers import configured_api_key
 
 st.set_page_config(layout="wide", page_title="PinPoint")
 
@@ -32,43 +44,42 @@ with st.sidebar:
                            icons=['coin', 'bank', 'globe'], default_index=0)
     st.write(""" #### Copyright © 2025 GioData Solutions. All rights reserved. """)
 
-openai_api_key = st.secrets["api_keys"]["openai_key"]
+    # AI response cache usage since the server started
+    if metrics := llm_metrics():
+        with st.expander('AI response cache'):
+            st.caption(format_llm_metrics(metrics))
+
+# None without a secrets file; the fake provider (PINPOINT_LLM_PROVIDER=fake) needs no key
+openai_api_key = configured_api_key()
 
 if selected == 'Hero Product Mapping':
-    @st.cache_data
     def load_wealth_data():
         try:
-            df = pd.read_excel('data/Wealth Indicator.xlsx', sheet_name='City Municipality')
-            return df
+            # Shared, indexed table; the filters below return views of it
+            return load_wealth_dataset()['table']
         except:
             st.error("Could not load Wealth Indicator.xlsx file")
             st.stop()
 
-    @st.cache_data
-    def load_shapefile(scope):
+    def load_shapefile(scope, zoom_level):
         try:
+            # Outlines come from the simplified boundary cache at a resolution suited to the zoom
             if scope == 'Regional':
-                return gpd.read_file('data/gadm41_PHL_shp/gadm41_PHL_1.shp')
+                return load_boundaries(1, zoom_level)
             elif scope == 'Provincial':
-                return gpd.read_file('data/gadm41_PHL_shp/gadm41_PHL_1.shp')
+                return load_boundaries(1, zoom_level)
             else:
-                return gpd.read_file('data/gadm41_PHL_shp/gadm41_PHL_2.shp')
+                return load_boundaries(2, zoom_level)
         except:
             st.error(f"Could not load Philippines shapefile for {scope.lower()} level")
             st.stop()
 
     df = load_wealth_data()
-    wealth_metrics = ['City/Municipality Total GDP', 'GDP Growth (%)', 'Poverty Rate (%)', 
-                    'Annual LGU Income', 'Condominium', 'Retail Hubs', 'Developers', 
-                    'Car Showrooms', 'International Schools', 'Hospitals', 
-                    'Luxury Hotel Presence', 'Casinos']
+    wealth_metrics = list(WEALTH_METRICS)
 
     try:
         df = load_wealth_data()
-        wealth_metrics = ['City/Municipality Total GDP', 'GDP Growth (%)', 'Poverty Rate (%)', 
-                        'Annual LGU Income', 'Condominium', 'Retail Hubs', 'Developers', 
-                        'Car Showrooms', 'International Schools', 'Hospitals', 
-                        'Luxury Hotel Presence', 'Casinos']
+        wealth_metrics = list(WEALTH_METRICS)
     except:
         st.error("Could not load Wealth Indicator.xlsx file")
         st.stop()
@@ -78,7 +89,7 @@ if selected == 'Hero Product Mapping':
 
 
     # Get region-province mapping
-    region_province_mapping = get_region_province_mapping(df)
+    region_province_mapping = get_region_province_mapping()
 
     col1, col2, col3, col4 = st.columns(4)
 
@@ -92,13 +103,13 @@ if selected == 'Hero Product Mapping':
         if selected_region == 'All':
             province_options = ['All'] + [province for provinces in region_province_mapping.values() for province in provinces]
         else:
-            province_options = ['All'] + region_province_mapping[selected_region]
+            province_options = ['All'] + list(region_province_mapping[selected_region])
         
         selected_province = st.selectbox('Select Province', province_options)
 
     with col3:
         # City/Municipality filter - updates based on selected region and province
-        city_options = get_city_options(df, selected_region, selected_province)
+        city_options = get_city_options(selected_region, selected_province)
         selected_city = st.selectbox('Select City/Municipality', city_options)
 
     with col4:
@@ -106,12 +117,10 @@ if selected == 'Hero Product Mapping':
         wealth_indicators = ['All'] + wealth_metrics
         indicator = st.selectbox('Wealth Indicator', wealth_indicators)
 
-    # Determine scope and filter data based on selections
+    # Determine scope based on selections
     scope = determine_scope_from_filters(selected_region, selected_province, selected_city)
-    filtered_df = filter_data_by_all_selections(df, selected_region, selected_province, selected_city)
 
 
-    gdf = load_shapefile(scope)
     if scope == 'Regional':
         shapefile_column = 'NAME_1'
         data_column = 'Region'
@@ -125,17 +134,21 @@ if selected == 'Hero Product Mapping':
         data_column = 'City'
         zoom_level = 8
 
+    # The map auto-zooms to a selected province, which needs finer outlines than the overview
+    geometry_zoom = 10 if selected_province != 'All' else zoom_level
+    gdf = load_shapefile(scope, geometry_zoom)
+
     # Special handling when showing all provinces (when All regions selected)
     if selected_region == 'All' and selected_province == 'All' and selected_city == 'N/A' and scope == 'Provincial':
         # Process data at regional level first, then distribute to provinces
-        regional_processed_df = process_wealth_data(filtered_df, 'Regional', indicator)
+        regional_processed_df = wealth_scores('Regional', indicator, selected_region, selected_province, selected_city)
         data_column = 'Region'  # This will trigger the regional-to-provincial mapping in merge function
         processed_df = regional_processed_df
     elif selected_city == 'All' and scope == 'City':
         # When "All" cities are selected, show city-level data
-        processed_df = process_wealth_data(filtered_df, 'City', indicator)
+        processed_df = wealth_scores('City', indicator, selected_region, selected_province, selected_city)
     else:
-        processed_df = process_wealth_data(filtered_df, scope, indicator)
+        processed_df = wealth_scores(scope, indicator, selected_region, selected_province, selected_city)
 
     col_left, col_right = st.columns([2, 6])
 
@@ -173,7 +186,7 @@ if selected == 'Hero Product Mapping':
                 )
 
             # st.markdown(f"##### MSME's Distribution")
-            msmes_data = pd.read_excel('data/Wealth Indicator.xlsx', sheet_name='MSMEs')
+            msmes_data = load_table('msmes')
             msmes_data = msmes_data[msmes_data['Region'] == selected_region]
 
             # Pie Chart
@@ -198,23 +211,29 @@ if selected == 'Hero Product Mapping':
         elif selected_city == 'N/A':
             st.info("💡 Please select a region, province, or city/municipality to view the heatmap.")
 
+    # Data for the AI analysis; stays empty when no map is drawn
+    ai_map_data = pd.DataFrame()
+
     with col_right:
         map_center = [12.8797, 121.7740]
         m = folium.Map(location=map_center, zoom_start=zoom_level, scrollWheelZoom=False, tiles='CartoDB positron')
         
         # Only render map data if we have processed data and not in N/A state
         if not processed_df.empty and selected_city != 'N/A':
+            # City rows also carry their Province so same-named municipalities stay apart on the map
+            key_columns = ['Province', 'City'] if data_column == 'City' else [data_column]
             if indicator == 'All':
-                map_data = processed_df[[data_column, 'Total_Wealth_Score']].copy()
-                map_data.columns = [data_column, 'Value']
+                map_data = processed_df[key_columns + ['Total_Wealth_Score']].copy()
+                map_data.columns = key_columns + ['Value']
                 metric_name = "Total Wealth Score"
             else:
-                map_data = processed_df[[data_column, indicator]].copy()
-                map_data.columns = [data_column, 'Value']
+                map_data = processed_df[key_columns + [indicator]].copy()
+                map_data.columns = key_columns + ['Value']
                 metric_name = indicator
             
             # Merge with shapefile
-            merged_gdf = merge_shapefile_data(gdf, map_data, shapefile_column, data_column, scope)
+            merged_gdf = merge_shapefile_data(gdf, map_data, shapefile_column, data_column, scope,
+                                              geometry_key=(scope, geometry_zoom))
             ai_map_data = map_data
             if selected_province != 'All':
                 merged_gdf = merged_gdf[merged_gdf['NAME_1'] == selected_province]
@@ -232,11 +251,13 @@ if selected == 'Hero Product Mapping':
                     ne = [bounds[3], bounds[2]]  # north-east corner
                     m.fit_bounds([sw, ne])  # <-- this makes it auto zoom!
                     
-                    choropleth = folium.Choropleth(
-                        geo_data=merged_gdf.__geo_interface__,
-                        data=merged_gdf,
-                        columns=[shapefile_column, 'Value'],
-                        key_on=f'feature.properties.{shapefile_column}',
+                    # One GeoJSON layer carries both the fill colours and the tooltips; colours are
+                    # keyed on the unique GADM id, since names repeat across provinces
+                    choropleth = add_choropleth_layer(
+                        m, merged_gdf, GADM_KEYS[shapefile_column], 'Value',
+                        label=scope,
+                        name_column=shapefile_column,
+                        metric_name=metric_name,
                         fill_color='YlOrRd',
                         fill_opacity=0.7,
                         line_opacity=0.2,
@@ -244,7 +265,7 @@ if selected == 'Hero Product Mapping':
                         legend_name=f'{metric_name}',
                         nan_fill_color='lightgray',
                         nan_fill_opacity=0.3,
-                    ).add_to(m)
+                    )
                     
                     legend_html = f'''
                     <div style="position: fixed; 
@@ -279,29 +300,6 @@ if selected == 'Hero Product Mapping':
                     </div>
                     '''
                     m.get_root().html.add_child(folium.Element(legend_html))
-
-                    tooltip_features = []
-                    for idx, row in merged_gdf.iterrows():
-                        if pd.notna(row['Value']):
-                            tooltip_features.append({
-                                'geometry': row['geometry'],
-                                'properties': {
-                                    'name': row[shapefile_column],
-                                    'value': row['Value'],
-                                    'metric': metric_name
-                                }
-                            })
-                    
-                    for feature in tooltip_features:
-                        formatted_value = format_large_values(feature['properties']['value'], feature['properties']['metric'])
-                        folium.GeoJson(
-                            feature['geometry'],
-                            style_function=lambda x: {'fillOpacity': 0, 'weight': 0, 'color': 'transparent'},
-                            tooltip=folium.Tooltip(
-                                f"{scope}: {feature['properties']['name']}<br>{feature['properties']['metric']}: {formatted_value}",
-                                sticky=True
-                            )
-                        ).add_to(m)
         elif selected_city == 'N/A':
             # Add a text overlay when N/A is selected
             instruction_html = '''
@@ -330,7 +328,7 @@ elif selected == 'Pop-Up Strategy':
     st.title('Kababayan Connect: OFW Pop-Up Expansion Strategy')
     st.caption('Data Sources: Bangko Sentral ng Pilipinas (BSP), Philippine Statistics Authority (PSA), Department of Migrant Workers (DMW)')
 
-    df = pd.read_excel('data/OFW Cash Remittances - All Countries.xlsx')
+    df = load_table('ofw_remittances')
 
     col1, col2, col3, col4 = st.columns(4)
     with col1:
@@ -345,7 +343,8 @@ elif selected == 'Pop-Up Strategy':
     col5, col6 = st.columns([2,6])
 
     with col5:
-        filtered_df, current_total, delta = calculate_ofw_remittances(df, continent, country, type_, year)
+        remittances = query_remittances(continent, country, type_, year)
+        filtered_df, current_total, delta = remittances['filtered'], remittances['total'], remittances['delta']
 
         st.metric(
             label="""Total OFW Remittances""",
@@ -353,7 +352,7 @@ elif selected == 'Pop-Up Strategy':
             delta=delta
         )
 
-        top_countries = show_top_countries_by_remittances(filtered_df)
+        top_countries = show_top_countries_by_remittances(remittances['top_countries'])
 
         st.markdown("##### Mode of Remittance Distribution")
         show_remittance_pie_chart()
@@ -372,7 +371,7 @@ elif selected == 'Pop-Up Strategy':
 
     countries_selected = st.multiselect("Select Country(s)", sorted(df['Country'].unique()), default=top_countries['Country'].tolist()[0])
 
-    col7, col8 = st.columns(2)
+    col7, col8, col9 = st.columns(3)
     with col7:
         if type_ == 'Combined':
             type_selected = ['Land-based', 'Sea-based']
@@ -381,8 +380,10 @@ elif selected == 'Pop-Up Strategy':
         types_selected = st.multiselect("Select Type(s)", df['Type'].unique(), default=type_selected)
     with col8:
         horizon = st.selectbox("Select Forecast Horizon (months)", options=[6,12,24], index=1)
+    with col9:
+        engine = st.selectbox("Forecast Engine", options=list(FORECASTERS))
     
-    filtered_df_forecast, all_forecasts = forecast_and_plot(df, countries_selected, types_selected, horizon)
+    filtered_df_forecast, all_forecasts = forecast_and_plot(df, countries_selected, types_selected, horizon, engine)
 
     st.markdown("##### Agentic AI Pop-Up Expansion Strategy Analysis")
     
@@ -395,38 +396,11 @@ elif selected == 'Competitor Analysis':
     # Bank selection first
     bank = st.selectbox('Select Bank', ['All', 'BPI', 'BDO', 'UnionBank', 'Metrobank', 'Landbank', 'Other Financial Institutions'])
 
-    # Map each bank to its dataset
-    bank_files = {
-        'All': "data/Branch Location/ALL_Establishments.csv",
-        'BPI': "data/Branch Location/BPI_LUZON.csv",
-        'BDO': "data/Branch Location/BDO_LUZON.csv",
-        'UnionBank': "data/Branch Location/UNIONBANK_LUZON.csv",
-        'Metrobank': "data/Branch Location/METROBANK_LUZON.csv",
-        'Landbank': "data/Branch Location/LANDBANK_LUZON.csv",
-        'Other Financial Institutions': "data/Branch Location/OTHERS_LUZON.csv"
-    }
-
-    # Load dataset for selected bank
-    df = pd.read_csv(bank_files[bank], encoding='latin-1')
-    df['Longitude'] = pd.to_numeric(df['Longitude'], errors='coerce')
-    df['Latitude'] = pd.to_numeric(df['Latitude'], errors='coerce')
+    # Establishments for the selected bank, served from the shared establishments table
+    df = select_establishments(bank)
 
-    # Drop rows with invalid coordinates
-    df = df.dropna(subset=['Latitude', 'Longitude'])
-
-    default_region = "NCR"
-    default_province = "NCR"
-    default_city = "Manila"
-
-    if 'region' not in locals():
-        region = default_region
-    if 'province' not in locals():
-        province = default_province
-    if 'city' not in locals():
-        city = default_city
-
-    # Dependent filters (Region → Province → City)
-    col1, col2, col3 = st.columns(3)
+    # Dependent filters (Region → Province → City) and competitor search radius
+    col1, col2, col3, col4 = st.columns(4)
     with col1:
         region = st.selectbox('Select Region', ['All'] + sorted(df['Region'].unique().tolist()), index=2)
     with col2:
@@ -435,14 +409,11 @@ elif selected == 'Competitor Analysis':
     with col3:
         city_options = df[df['Province'] == province]['City'].unique().tolist() if province != 'All' else df['City'].unique().tolist()
         city = st.selectbox('Select City', ['All'] + sorted(city_options))
+    with col4:
+        radius_km = st.slider('Competitor Radius (km)', min_value=1, max_value=10, value=3)
 
     # Apply filters
-    if region != 'All':
-        df = df[df['Region'] == region]
-    if province != 'All':
-        df = df[df['Province'] == province]
-    if city != 'All':
-        df = df[df['City'] == city]
+    df = select_establishments(bank, region, province, city)
 
     # Default center = Philippines
     map_center = [14.5995, 120.9842]
@@ -462,99 +433,68 @@ elif selected == 'Competitor Analysis':
         elif region != "All":
             zoom_level = 8
 
-    #st.dataframe(df)
-
-    # Load all datasets into one combined DataFrame for summary counts
-    dfs = []
-    for b, path in bank_files.items():
-        if b != "All":  # Skip "All" placeholder
-            temp = pd.read_csv(path, encoding='latin-1')
-            temp['Bank'] = b
-            dfs.append(temp)
-
-    combined_df = pd.concat(dfs, ignore_index=True)
-    combined_df['Latitude'] = pd.to_numeric(combined_df['Latitude'], errors='coerce')
-    combined_df['Longitude'] = pd.to_numeric(combined_df['Longitude'], errors='coerce')
-    combined_df = combined_df.dropna(subset=['Latitude', 'Longitude'])
-
-    # Apply the same filters to combined_df
-    if region != 'All':
-        combined_df = combined_df[combined_df['Region'] == region]
-    if province != 'All':
-        combined_df = combined_df[combined_df['Province'] == province]
-    if city != 'All':
-        combined_df = combined_df[combined_df['City'] == city]
-
-    bank_counts = combined_df['Bank'].value_counts()
-
     # Create a container for the cards
     st.subheader("Bank Branch and ATM Summary")
 
     banks = ['BPI', 'BDO', 'UnionBank', 'Metrobank', 'Landbank']
     card_cols = st.columns(5)
 
-    bank_summary = {}
+    # Counts for every bank in the same area, served from the precomputed cube
+    bank_summary = get_bank_summary(banks, region, province, city)
 
-    for idx, bank_name in enumerate(banks):
-        bank_df = combined_df[combined_df['Bank'] == bank_name]
-        total = len(bank_df)
-        atm_count = len(bank_df[bank_df['Types'].str.contains('ATM', na=False)])
-        branch_count = total - atm_count
+    # Start the AI recommendation now; it streams in below once the map and metrics have painted
+    ai_recommendation = start_branch_analysis(df, bank_summary)
 
-        bank_summary[bank_name] = {"Branches": branch_count, "ATMs": atm_count, "Total": total}
+    for idx, bank_name in enumerate(banks):
+        counts = bank_summary[bank_name]
 
         with card_cols[idx]:
             st.metric(
                 label=bank_name,
-                value=f"{total} locations",
-                delta=f"{branch_count} Branch / {atm_count} ATM"
+                value=f"{counts['Total']} locations",
+                delta=f"{counts['Branches']} Branch / {counts['ATMs']} ATM"
             )
 
-    # Folium Map
-    # m = folium.Map(location=[14.5995, 120.9842], zoom_start=6, scrollWheelZoom=False, tiles='CartoDB positron')
-# m = folium.Map(location=map_center, zoom_start=zoom_level, scrollWheelZoom=False, tiles='CartoDB positron')
+    map_col, stats_col = st.columns([3, 1])
+
+    with map_col:
+        render_mode = st.radio('Map Rendering', RENDER_MODES, horizontal=True)
 
-map_col, stats_col = st.columns([3, 1])
+        # Marker-per-location for small selections, clustered or single-layer rendering for large ones
+        m, render_stats = build_branch_map(df, map_center, zoom_level, radius_km, render_mode)
 
-with map_col:
-    # Create the map once
-    m = folium.Map(location=map_center, zoom_start=zoom_level, scrollWheelZoom=False, tiles='CartoDB positron')
+        # Display map inside this column
+        st_folium(m, height=500, width=800)
+        st.caption(format_render_stats(render_stats))
 
-    # Add all markers and circles
-    for _, row in df.iterrows():
-        popup_text = (
-            f"<b>{row['Branch Name'] if 'Branch Name' in df.columns else row['Place ID']}</b><br>"
-            f"⭐ {row['Rating'] if 'Rating' in df and not pd.isna(row['Rating']) else 'N/A'} "
-            f"({row['User Ratings Count'] if 'User Ratings Count' in df.columns and not pd.isna(row['User Ratings Count']) else 0} reviews)"
+    with stats_col:
+        st.subheader('Branch Summary')
+        st.metric(
+            label='Number of ATMs & Branches',
+            value=get_branch_counts(region, province, city, bank)['Total']
         )
 
-        folium.Circle(
-            location=[row['Latitude'], row['Longitude']],
-            radius=3000,
-            color='red',
-            fill=True,
-            fill_color='red',
-            fill_opacity=0.3
-        ).add_to(m)
-
-        folium.Marker(
-            location=[row['Latitude'], row['Longitude']],
-            popup=popup_text
-        ).add_to(m)
-
-    # Display map inside this column
-    st_folium(m, height=500, width=800)
-
-with stats_col:
-    st.subheader('Branch Summary')
-    st.metric(
-        label='Number of ATMs & Branches',
-        value=len(df)
-    )
+        # Competitor density around the selected bank's locations
+        if bank != 'All' and not df.empty:
+            proximity = competitor_proximity(df, bank, radius_km)
+            st.metric(
+                label=f'Avg. Competitors Within {radius_km} km',
+                value=f"{proximity['Competitors Within Radius'].mean():,.1f}"
+            )
+            st.metric(
+                label='Median Nearest Competitor',
+                value=f"{proximity['Nearest Competitor (km)'].median():,.2f} km"
+            )
+
+        st.download_button(
+            'Download Branch Counts (CSV)',
+            data=branch_cube_csv(),
+            file_name='branch_counts.csv',
+            mime='text/csv'
+        )
 
-AI_col = st.container() 
+    AI_col = st.container() 
 
-with AI_col:
-    ai_recommendation = agentic_ai_branch_analyzer(df, bank_summary)
-    st.subheader('Agentic AI Branch Improvement Recommendation')
-    st.write(ai_recommendation)
+    with AI_col:
+        st.subheader('Agentic AI Branch Improvement Recommendation')
+        st.write_stream(ai_recommendation)
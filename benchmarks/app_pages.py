@@ -0,0 +1,78 @@
+"""
+Headless render time of every page, with the AI analyses served by the fake LLM provider.
+
+Each page is run in Streamlit's AppTest harness several times. The first run
+pays for data loading and a generated (simulated) reply. Later runs show the
+warm path, with the data caches filled and the replies served from the
+response cache. Nothing is sent to OpenAI, no secrets file is needed, and the
+response cache is a throwaway file.
+
+The sidebar menu is a custom component that AppTest cannot click, so each
+page is run from a copy of app.py with that page selected.
+
+Run from the repository root:
+
+    python benchmarks/app_pages.py [--runs 3] [--first-token-ms 300] [--token-ms 15]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = ['Hero Product Mapping', 'Competitor Analysis', 'Pop-Up Strategy']
+
+def page_script(index, directory):
+    # app.py with the sidebar menu opening on the given page
+    with open(os.path.join(ROOT, 'app.py'), encoding='utf-8') as f:
+        source = f.read().replace('default_index=0', f'default_index={index}')
+    path = os.path.join(directory, f'app_page_{index}.py')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(source)
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=3, help='runs per page (the first is cold)')
+    parser.add_argument('--first-token-ms', type=float, default=300, help='simulated time to first token')
+    parser.add_argument('--token-ms', type=float, default=15, help='simulated time between chunks')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    os.environ.update({
+        'PINPOINT_LLM_PROVIDER': 'fake',
+        'PINPOINT_LLM_FIRST_TOKEN_MS': str(args.first_token_ms),
+        'PINPOINT_LLM_TOKEN_MS': str(args.token_ms),
+        'PINPOINT_LLM_CACHE_PATH': os.path.join(directory, 'llm_cache.sqlite'),
+    })
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+
+    import pandas as pd
+    from streamlit.testing.v1 import AppTest
+    from llm_gateway import format_llm_metrics, llm_metrics
+
+    results = []
+    for index, page in enumerate(PAGES):
+        path = page_script(index, directory)
+        for run in range(args.runs):
+            app = AppTest.from_file(path, default_timeout=600)
+            start = time.perf_counter()
+            app.run()
+            results.append({
+                'page': page,
+                'run': 'cold' if run == 0 else f'warm {run}',
+                'seconds': time.perf_counter() - start,
+                'exceptions': len(app.exception),
+                'errors': len(app.error),
+            })
+
+    report = pd.DataFrame(results)
+    print(report.to_string(index=False, float_format=lambda x: f"{x:,.2f}"))
+    print()
+    print(format_llm_metrics(llm_metrics()).replace('  \n', '\n'))
+
+if __name__ == '__main__':
+    main()
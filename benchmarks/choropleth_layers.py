@@ -0,0 +1,109 @@
+"""
+Payload and render time of the Hero Product Mapping choropleth at City scope for all of Luzon.
+
+Compares the previous renderer (a Choropleth plus one tooltip GeoJson layer
+per city) with add_choropleth_layer (one GeoJSON layer carrying the
+tooltips), on full-resolution and on cached simplified outlines.
+
+Run from the repository root:
+
+    python benchmarks/choropleth_layers.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import folium
+import pandas as pd
+import geopandas as gpd
+from boundary_cache import SHAPEFILES, load_boundaries
+from hero_product_mapping import GADM_KEYS, add_choropleth_layer, format_large_values, merge_shapefile_data
+from wealth_scores import wealth_scores
+
+METRIC_NAME = 'Total Wealth Score'
+
+def legacy_choropleth(m, merged_gdf, key_column):
+    # The renderer used before add_choropleth_layer: every polygon is written twice
+    folium.Choropleth(
+        geo_data=merged_gdf.__geo_interface__,
+        data=merged_gdf,
+        columns=[key_column, 'Value'],
+        key_on=f'feature.properties.{key_column}',
+        fill_color='YlOrRd',
+        fill_opacity=0.7,
+        line_opacity=0.2,
+        highlight=True,
+        legend_name=METRIC_NAME,
+    ).add_to(m)
+
+    for _, row in merged_gdf.iterrows():
+        folium.GeoJson(
+            row['geometry'],
+            style_function=lambda x: {'fillOpacity': 0, 'weight': 0, 'color': 'transparent'},
+            tooltip=folium.Tooltip(
+                f"City: {row[key_column]}<br>{METRIC_NAME}: {format_large_values(row['Value'], METRIC_NAME)}",
+                sticky=True
+            )
+        ).add_to(m)
+
+def single_layer_choropleth(m, merged_gdf, key_column):
+    # Coloured by the unique GID_2, as the page does; the name only labels the tooltip
+    add_choropleth_layer(
+        m, merged_gdf, GADM_KEYS[key_column], 'Value',
+        label='City',
+        name_column=key_column,
+        metric_name=METRIC_NAME,
+        fill_color='YlOrRd',
+        fill_opacity=0.7,
+        line_opacity=0.2,
+        highlight=True,
+        legend_name=METRIC_NAME,
+    )
+
+def measure(renderer, merged_gdf, key_column):
+    start = time.perf_counter()
+    m = folium.Map(location=[12.8797, 121.7740], zoom_start=8, tiles='CartoDB positron')
+    renderer(m, merged_gdf, key_column)
+    html = m.get_root().render()
+    return len(html.encode('utf-8')), time.perf_counter() - start
+
+def city_scope_data():
+    # Built as app.py builds it: City rows carry their Province, so the crosswalk joins
+    # each municipality to its own GID_2 instead of fanning out same-named ones
+    processed_df = wealth_scores('City', 'All')
+    map_data = processed_df[['Province', 'City', 'Total_Wealth_Score']].copy()
+    map_data.columns = ['Province', 'City', 'Value']
+    return map_data
+
+def main():
+    map_data = city_scope_data()
+    outlines = {
+        'full resolution': gpd.read_file(SHAPEFILES[2]),
+        'simplified (zoom 8)': load_boundaries(2, 8),
+    }
+
+    results = []
+    for outline_name, gdf in outlines.items():
+        merged_gdf = merge_shapefile_data(gdf, map_data, 'NAME_2', 'City', 'City',
+                                          geometry_key=outline_name).dropna(subset=['Value'])
+        for renderer_name, renderer in [('legacy', legacy_choropleth), ('single layer', single_layer_choropleth)]:
+            payload_bytes, seconds = measure(renderer, merged_gdf, 'NAME_2')
+            results.append({
+                'outlines': outline_name,
+                'renderer': renderer_name,
+                'features': len(merged_gdf),
+                'payload_mb': payload_bytes / 1e6,
+                'render_s': seconds,
+            })
+
+    report = pd.DataFrame(results)
+    baseline = report.iloc[0]
+    report['payload_reduction'] = baseline['payload_mb'] / report['payload_mb']
+    report['speedup'] = baseline['render_s'] / report['render_s']
+    print(report.to_string(index=False, float_format=lambda x: f"{x:,.2f}"))
+
+if __name__ == '__main__':
+    main()
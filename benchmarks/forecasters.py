@@ -0,0 +1,72 @@
+"""
+Accuracy versus latency of the remittance forecasters on the existing history.
+
+Each series' last HOLDOUT months are held out; every engine forecasts them
+from the months before. SARIMAX fits into a throwaway model store so cached
+parameters do not flatter its latency. Use --limit to keep the SARIMAX run
+short (the series with the largest remittances are taken first).
+
+Run from the repository root:
+
+    python benchmarks/forecasters.py [--limit 50] [--holdout 6]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from data_store import load_table
+from forecast_engine import forecast_groups
+from forecast_store import SarimaxModelStore
+from forecasters import FORECASTERS, SarimaxForecaster, get_forecaster
+from forecast_backtest import score_forecasts
+
+def holdout_groups(limit, holdout):
+    df = load_table('ofw_remittances')
+    top = df.groupby(['Country', 'Type'])['Value'].sum().nlargest(limit).index if limit else None
+    groups = forecast_groups(df)
+    if top is not None:
+        groups = [group for group in groups if (group[0], group[1]) in top]
+    train = [(country, type_, series.iloc[:-holdout]) for country, type_, series in groups]
+    actual = {(country, type_): series.iloc[-holdout:] for country, type_, series in groups}
+    return train, actual
+
+def score(forecasts, actual):
+    errors, covered, points, failures = score_forecasts(forecasts, actual)
+    return {
+        'mape_pct': 100 * float(np.mean([value for _, value in errors])) if errors else float('nan'),
+        'ci_coverage_pct': 100 * covered / points if points else float('nan'),
+        'failures': failures,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--limit', type=int, default=50, help='series to evaluate (0 for all)')
+    parser.add_argument('--holdout', type=int, default=6, help='months held out per series')
+    args = parser.parse_args()
+
+    train, actual = holdout_groups(args.limit, args.holdout)
+    results = []
+    for name in FORECASTERS:
+        if name == 'SARIMAX':
+            forecaster = SarimaxForecaster(store=SarimaxModelStore(tempfile.mkdtemp()), max_workers=1)
+        else:
+            forecaster = get_forecaster(name)
+
+        start = time.perf_counter()
+        forecasts = list(forecaster.forecast_batch(train, steps=args.holdout))
+        seconds = time.perf_counter() - start
+        results.append({'engine': name, 'series': len(train), 'seconds': seconds,
+                        'ms_per_series': 1000 * seconds / max(len(train), 1), **score(forecasts, actual)})
+
+    report = pd.DataFrame(results)
+    print(report.to_string(index=False, float_format=lambda x: f"{x:,.2f}"))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+"""
+Simplified GADM boundary cache for the Hero Product Mapping choropleths.
+
+Full-resolution GADM outlines make municipality maps several megabytes of
+HTML. Each administrative level is simplified once at a few zoom-appropriate
+tolerances (about one screen pixel at that zoom) and stored as GeoParquet
+under data/parquet/boundaries/. Simplification works on the whole coverage at
+once, so neighbouring polygons keep sharing the same edges and no gaps or
+overlaps appear between them.
+
+A level is rebuilt when its .shp or its .dbf changes (the .dbf holds the
+NAME_*/GID_* attributes the maps join on). Read-only deployments, which
+cannot write the cache, simplify the shapefile in memory instead.
+
+Build every level ahead of time with:
+
+    python boundary_cache.py [--force]
+"""
+
+import os
+import json
+import hashlib
+import argparse
+from datetime import datetime, timezone
+
+import shapely
+from shapely.errors import GEOSException
+import geopandas as gpd
+import streamlit as st
+from data_store import PARQUET_DIR, file_digest, file_state, read_manifest, source_changed, write_manifest
+
+BOUNDARY_DIR = os.path.join(PARQUET_DIR, 'boundaries')
+BOUNDARY_MANIFEST_PATH = os.path.join(BOUNDARY_DIR, 'manifest.json')
+
+SHAPEFILES = {
+    1: 'data/gadm41_PHL_shp/gadm41_PHL_1.shp',
+    2: 'data/gadm41_PHL_shp/gadm41_PHL_2.shp',
+}
+
+# Attribute columns kept per level; everything else only inflates the GeoJSON properties
+KEEP_COLUMNS = {
+    1: ['GID_1', 'NAME_1'],
+    2: ['GID_1', 'NAME_1', 'GID_2', 'NAME_2'],
+}
+
+# Folium zoom level -> simplification tolerance in degrees (roughly one pixel at that zoom)
+ZOOM_TOLERANCES = {
+    6: 0.02,
+    7: 0.01,
+    8: 0.005,
+    10: 0.001,
+}
+
+def tolerance_zoom(zoom_level):
+    """
+    The cached zoom level to serve for a map zoom (the finest one not coarser than needed)
+    """
+    eligible = [zoom for zoom in ZOOM_TOLERANCES if zoom >= zoom_level]
+    return min(eligible) if eligible else max(ZOOM_TOLERANCES)
+
+def simplify_coverage(gdf, tolerance):
+    """
+    Simplify all polygons together so shared borders stay shared
+    """
+    try:
+        geometry = shapely.coverage_simplify(gdf.geometry.values, tolerance)
+    except (AttributeError, GEOSException):
+        # Older GEOS builds, or outlines that are not a clean coverage
+        geometry = gdf.geometry.simplify(tolerance, preserve_topology=True).values
+
+    simplified = gdf.copy()
+    simplified.geometry = geometry
+    return simplified
+
+def boundary_path(level, zoom):
+    """
+    Where the simplified outlines for a level and tolerance zoom are stored
+    """
+    return os.path.join(BOUNDARY_DIR, f"gadm41_PHL_{level}_z{zoom}.parquet")
+
+def source_files(level):
+    """
+    The files a level is built from: the geometry (.shp) and its attribute table (.dbf)
+    """
+    shapefile = SHAPEFILES[level]
+    return [shapefile, os.path.splitext(shapefile)[0] + '.dbf']
+
+def _combined_version(files):
+    # One version for the level from the per-file hashes
+    digest = hashlib.sha256()
+    for path in sorted(files):
+        digest.update(files[path]['sha256'].encode('utf-8'))
+    return digest.hexdigest()
+
+def build_boundaries(level, manifest=None):
+    """
+    Simplify one GADM level at every tolerance and record it in the boundary manifest
+    """
+    manifest = read_manifest(BOUNDARY_MANIFEST_PATH) if manifest is None else manifest
+    source = SHAPEFILES[level]
+
+    gdf = gpd.read_file(source)[KEEP_COLUMNS[level] + ['geometry']]
+    os.makedirs(BOUNDARY_DIR, exist_ok=True)
+    files = {path: {'sha256': file_digest(path), **file_state(path)} for path in source_files(level)}
+
+    sizes = {}
+    for zoom, tolerance in ZOOM_TOLERANCES.items():
+        simplified = simplify_coverage(gdf, tolerance)
+        path = boundary_path(level, zoom)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        simplified.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+        sizes[str(zoom)] = len(json.dumps(simplified.__geo_interface__))
+
+    manifest[str(level)] = {
+        'source': source,
+        'sha256': _combined_version(files),
+        'files': files,
+        'tolerances': {str(zoom): tolerance for zoom, tolerance in ZOOM_TOLERANCES.items()},
+        'features': len(gdf),
+        'full_geojson_bytes': len(json.dumps(gdf.__geo_interface__)),
+        'geojson_bytes': sizes,
+        'built_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    }
+    write_manifest(manifest, BOUNDARY_MANIFEST_PATH)
+    return manifest[str(level)]
+
+def boundaries_stale(level, manifest=None):
+    """
+    Check whether a level must be rebuilt because its .shp or .dbf changed or it was never built
+    """
+    manifest = read_manifest(BOUNDARY_MANIFEST_PATH) if manifest is None else manifest
+    entry = manifest.get(str(level))
+    if entry is None or entry.get('tolerances') != {str(z): t for z, t in ZOOM_TOLERANCES.items()}:
+        return True
+    if sorted(entry.get('files', {})) != sorted(source_files(level)):
+        return True
+    if not all(os.path.exists(boundary_path(level, zoom)) for zoom in ZOOM_TOLERANCES):
+        return True
+    return any(source_changed(path, entry['files'][path], manifest, BOUNDARY_MANIFEST_PATH)
+               for path in source_files(level))
+
+@st.cache_resource(show_spinner=False)
+def _read_boundaries(path, version):
+    # Shared across sessions; callers copy before modifying (merge_shapefile_data does)
+    return gpd.read_parquet(path)
+
+@st.cache_resource(show_spinner=False)
+def _simplify_source(level, zoom, state):
+    # Read-only fallback; state (the source files' sizes and mtimes) versions the entry
+    gdf = gpd.read_file(SHAPEFILES[level])[KEEP_COLUMNS[level] + ['geometry']]
+    return simplify_coverage(gdf, ZOOM_TOLERANCES[zoom])
+
+def load_boundaries(level, zoom_level):
+    """
+    GADM outlines for an administrative level, simplified for the given map zoom
+    """
+    zoom = tolerance_zoom(zoom_level)
+    manifest = read_manifest(BOUNDARY_MANIFEST_PATH)
+    try:
+        entry = build_boundaries(level, manifest) if boundaries_stale(level, manifest) else manifest[str(level)]
+    except OSError:
+        # Read-only deployments cannot write data/parquet; simplify the shapefile in memory instead
+        state = tuple((path, *file_state(path).values()) for path in source_files(level))
+        return _simplify_source(level, zoom, state)
+    return _read_boundaries(boundary_path(level, zoom), entry['sha256'])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the simplified GADM boundary cache.')
+    parser.add_argument('--force', action='store_true', help='rebuild every level even if its shapefile is unchanged')
+    args = parser.parse_args()
+
+    manifest = read_manifest(BOUNDARY_MANIFEST_PATH)
+    for level in SHAPEFILES:
+        if args.force or boundaries_stale(level, manifest):
+            build_boundaries(level, manifest)
+        entry = manifest[str(level)]
+        print(f"Level {level}: {entry['features']} features, full GeoJSON {entry['full_geojson_bytes'] / 1e6:,.1f} MB")
+        for zoom, size in entry['geojson_bytes'].items():
+            print(f"  zoom {zoom:>2} (tolerance {entry['tolerances'][zoom]}°): {size / 1e6:,.2f} MB")
@@ -1,17 +1,13 @@
-from openai import OpenAI
-import streamlit as st
 import pandas as pd
+from llm_gateway import stream_chat
+from prompt_context import branch_digest
 
-# Initialize the client once (make sure your API key is set in environment variables)
-openai_key = st.secrets["api_keys"]["openai_key"]
-client = OpenAI(api_key=openai_key)
-
-def agentic_ai_branch_analyzer(df: pd.DataFrame, bank_summary: dict) -> str:
+def branch_analysis_prompt(df: pd.DataFrame, bank_summary: dict) -> str:
     """
-    Analyze the bank reviews and return a summary on how to improve the branches.
+    The branch improvement prompt for the selected locations and competitor summary.
     """
-    # Limit dataframe size
-    df_text = df.head(100).to_string()
+    # Aggregates, weakest/strongest branches and review themes within the token budget
+    df_text = branch_digest(df)
 
     prompt = f"""
     You are a strategic financial analyst for BPI Bank.
@@ -30,13 +26,26 @@ def agentic_ai_branch_analyzer(df: pd.DataFrame, bank_summary: dict) -> str:
     Format response in clear bullet points.
     """
 
+    return prompt
+
+def _errors_as_text(stream):
+    # Surface a failed request in the page instead of raising, as the analyzer always has
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
-        )
-        return response.choices[0].message.content
+        yield from stream
     except Exception as e:
-        return f"Error: {str(e)}"
\ No newline at end of file
+        yield f"Error: {str(e)}"
+
+def start_branch_analysis(df: pd.DataFrame, bank_summary: dict):
+    """
+    Start the branch analysis in the background; pass the result to st.write_stream.
+    """
+    # Cached by prompt, so reruns with the same selection do not call the API again and
+    # sessions asking at the same moment share one call; the provider finds its own key
+    stream = stream_chat([{"role": "user", "content": branch_analysis_prompt(df, bank_summary)}], source='branch')
+    return _errors_as_text(stream)
+
+def agentic_ai_branch_analyzer(df: pd.DataFrame, bank_summary: dict) -> str:
+    """
+    Analyze the bank reviews and return a summary on how to improve the branches.
+    """
+    return ''.join(start_branch_analysis(df, bank_summary))
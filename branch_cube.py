@@ -0,0 +1,94 @@
+"""
+Precomputed branch/ATM counts for every Region, Province, City and Bank selection.
+
+The cube is built once per process from the establishments table with
+roll-ups to 'All' at every level, so any combination of filters on the
+Competitor Analysis page (or any other page) is answered with a dictionary
+lookup instead of re-filtering the establishments.
+
+Export the cube with:
+
+    python branch_cube.py branch_counts.csv
+"""
+
+import sys
+import itertools
+import pandas as pd
+import streamlit as st
+from establishments import load_establishments
+
+DIMENSIONS = ['Region', 'Province', 'City', 'Bank']
+
+@st.cache_resource(show_spinner=False)
+def build_branch_cube():
+    """
+    Branch, ATM and total counts for every (Region, Province, City, Bank) combination,
+    including 'All' roll-ups at each level
+    """
+    establishments = load_establishments()
+    frames = []
+
+    for rolled_up in itertools.product([False, True], repeat=len(DIMENSIONS)):
+        keys = [dim for dim, rolled in zip(DIMENSIONS, rolled_up) if not rolled]
+        if keys:
+            counts = establishments.groupby(keys + ['is_ATM'], observed=True).size().unstack('is_ATM', fill_value=0)
+            counts = counts.reindex(columns=[False, True], fill_value=0)
+            counts.columns = ['Branches', 'ATMs']
+            counts = counts.reset_index()
+        else:
+            atms = int(establishments['is_ATM'].sum())
+            counts = pd.DataFrame({'Branches': [len(establishments) - atms], 'ATMs': [atms]})
+
+        for dim, rolled in zip(DIMENSIONS, rolled_up):
+            if rolled:
+                counts[dim] = 'All'
+            else:
+                counts[dim] = counts[dim].astype(str)
+        frames.append(counts[DIMENSIONS + ['Branches', 'ATMs']])
+
+    cube = pd.concat(frames, ignore_index=True)
+    cube['Total'] = cube['Branches'] + cube['ATMs']
+    return cube
+
+@st.cache_resource(show_spinner=False)
+def _cube_lookup():
+    # (region, province, city, bank) -> (branches, atms)
+    cube = build_branch_cube()
+    keys = zip(*(cube[dim] for dim in DIMENSIONS))
+    return dict(zip(keys, zip(cube['Branches'].tolist(), cube['ATMs'].tolist())))
+
+def get_branch_counts(region='All', province='All', city='All', bank='All'):
+    """
+    Branch, ATM and total counts for one selection ('All' leaves a level unfiltered)
+    """
+    branches, atms = _cube_lookup().get((region, province, city, bank), (0, 0))
+    return {"Branches": branches, "ATMs": atms, "Total": branches + atms}
+
+def get_bank_summary(banks, region='All', province='All', city='All'):
+    """
+    Counts for several banks in the same area, keyed by bank
+    """
+    return {bank: get_branch_counts(region, province, city, bank) for bank in banks}
+
+def export_branch_cube(path):
+    """
+    Write the cube to a .csv or .parquet file
+    """
+    cube = build_branch_cube()
+    if str(path).endswith('.parquet'):
+        cube.to_parquet(path, index=False)
+    else:
+        cube.to_csv(path, index=False)
+    return path
+
+@st.cache_data(show_spinner=False)
+def branch_cube_csv():
+    """
+    The cube as CSV bytes for download buttons
+    """
+    return build_branch_cube().to_csv(index=False).encode('utf-8')
+
+if __name__ == '__main__':
+    output_path = sys.argv[1] if len(sys.argv) > 1 else 'branch_counts.csv'
+    export_branch_cube(output_path)
+    print(f"Wrote {len(build_branch_cube())} rows to {output_path}")
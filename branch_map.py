@@ -0,0 +1,131 @@
+"""
+Branch map rendering for the Competitor Analysis page.
+
+One folium.Marker plus one folium.Circle per location is fine for a city,
+but with 'All' selected it serializes thousands of Leaflet objects into the
+page. The renderer below switches on point count between:
+
+- Markers:   the original marker + coverage circle per location
+- Clustered: a FastMarkerCluster whose markers are created in the browser
+             from a compact coordinate array
+- GeoJSON:   a single GeoJSON layer of coverage circles with popups,
+             drawn on a canvas
+
+Measuring the HTML payload takes a second full render, so it is only done
+when asked for (measure_payload=True, or PINPOINT_MAP_PAYLOAD_STATS=1 while
+tuning).
+"""
+
+import os
+import time
+import folium
+import pandas as pd
+from folium.plugins import FastMarkerCluster
+
+RENDER_MODES = ['Auto', 'Markers', 'Clustered', 'GeoJSON']
+
+# Above this many points the per-location Marker/Circle objects get too heavy
+MARKER_LIMIT = 300
+
+# Debug flag: report the rendered payload size (costs an extra render of the map)
+MEASURE_PAYLOAD = os.environ.get('PINPOINT_MAP_PAYLOAD_STATS') == '1'
+
+CLUSTER_CALLBACK = """
+function (row) {
+    var marker = L.marker(new L.LatLng(row[0], row[1]));
+    marker.bindPopup(row[2]);
+    return marker;
+}
+"""
+
+def choose_render_mode(point_count, mode='Auto'):
+    """
+    Resolve 'Auto' to a concrete rendering mode based on the number of points
+    """
+    if mode != 'Auto':
+        return mode
+    return 'Markers' if point_count <= MARKER_LIMIT else 'Clustered'
+
+def build_popup_text(df):
+    """
+    Popup HTML for every row, built column-wise instead of per row
+    """
+    rating = df['Rating'].map(lambda x: 'N/A' if pd.isna(x) else x).astype(str)
+    reviews = df['User Ratings Count'].fillna(0).astype(int).astype(str)
+    return "<b>" + df['Branch Name'].astype(str) + "</b><br>⭐ " + rating + " (" + reviews + " reviews)"
+
+def _add_markers(m, df, popups, radius_m):
+    for lat, lon, popup_text in zip(df['Latitude'], df['Longitude'], popups):
+        folium.Circle(
+            location=[lat, lon],
+            radius=radius_m,
+            color='red',
+            fill=True,
+            fill_color='red',
+            fill_opacity=0.3
+        ).add_to(m)
+
+        folium.Marker(
+            location=[lat, lon],
+            popup=popup_text
+        ).add_to(m)
+
+def _add_cluster(m, df, popups):
+    data = [[float(lat), float(lon), popup_text] for lat, lon, popup_text in zip(df['Latitude'], df['Longitude'], popups)]
+    FastMarkerCluster(data, callback=CLUSTER_CALLBACK).add_to(m)
+
+def _add_geojson(m, df, popups, radius_m):
+    features = [
+        {
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [round(float(lon), 6), round(float(lat), 6)]},
+            'properties': {'popup': popup_text},
+        }
+        for lat, lon, popup_text in zip(df['Latitude'], df['Longitude'], popups)
+    ]
+    folium.GeoJson(
+        {'type': 'FeatureCollection', 'features': features},
+        marker=folium.Circle(radius=radius_m, color='red', fill=True, fill_color='red', fill_opacity=0.3, weight=1),
+        popup=folium.GeoJsonPopup(fields=['popup'], labels=False),
+    ).add_to(m)
+
+def build_branch_map(df, map_center, zoom_level, radius_km=3, mode='Auto', measure_payload=MEASURE_PAYLOAD):
+    """
+    Build the branch map and report how it was rendered
+
+    Returns the folium map and a dict with the resolved mode, number of
+    points, build time in seconds and, with measure_payload, the HTML
+    payload size in bytes (None otherwise).
+    """
+    start = time.perf_counter()
+    mode = choose_render_mode(len(df), mode)
+
+    m = folium.Map(location=map_center, zoom_start=zoom_level, scrollWheelZoom=False,
+                   tiles='CartoDB positron', prefer_canvas=(mode == 'GeoJSON'))
+
+    if not df.empty:
+        popups = build_popup_text(df)
+        if mode == 'Markers':
+            _add_markers(m, df, popups, radius_km * 1000)
+        elif mode == 'Clustered':
+            _add_cluster(m, df, popups)
+        else:
+            _add_geojson(m, df, popups, radius_km * 1000)
+
+    stats = {
+        'mode': mode,
+        'points': len(df),
+        'payload_bytes': None,
+        'build_seconds': time.perf_counter() - start,
+    }
+    if measure_payload:
+        stats['payload_bytes'] = len(m.get_root().render().encode('utf-8'))
+    return m, stats
+
+def format_render_stats(stats):
+    """
+    One-line caption describing how the map was rendered
+    """
+    payload = f"payload {stats['payload_bytes'] / 1024:,.0f} KB · " if stats['payload_bytes'] is not None else ''
+    return (f"Rendering: {stats['mode']} · {stats['points']:,} locations · "
+            f"{payload}built in {stats['build_seconds'] * 1000:,.0f} ms")
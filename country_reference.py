@@ -0,0 +1,168 @@
+"""
+Country reference table for the OFW remittance map.
+
+data/country_reference.csv lists every country in the remittance workbook
+with:
+
+- Country:   canonical name (as the workbook spells it)
+- Aliases:   other spellings, pipe-separated (ISO names, map outline names)
+- ISO3:      ISO 3166-1 alpha-3 code, the key the map joins on
+- Continent: the workbook's continent grouping, trailing spaces removed
+- South/West/North/East: bounding box of the country's main landmass and
+  nearby islands (blank for places too small to have an outline on the
+  world map)
+
+Names are canonicalized through the aliases, the choropleth joins on ISO3,
+and continent auto-zoom reads precomputed boxes instead of walking geometry.
+
+Rebuild the table (needs the optional pycountry package) with:
+
+    python country_reference.py
+"""
+
+import os
+
+import pandas as pd
+import shapely
+import streamlit as st
+from data_store import read_source
+from world_boundaries import WORLD_BOUNDARIES_PATH
+
+REFERENCE_PATH = 'data/country_reference.csv'
+
+BOUNDS_COLUMNS = ['South', 'West', 'North', 'East']
+
+# Polygons further than this (in degrees) from a country's largest one are left out of its box
+MAINLAND_RADIUS = 30
+
+# Workbook names pycountry cannot resolve (or resolves to the wrong country)
+ISO3_OVERRIDES = {
+    'Democratic Republic of the Congo': 'COD',
+    'Guinea Bissau': 'GNB',
+    'Hong Kong, SAR China': 'HKG',
+    'Macao, SAR China': 'MAC',
+    'Palestinian Territory': 'PSE',
+    'Saint Vincent and Grenadines': 'VCT',
+    'Saint-Barthélemy': 'BLM',
+    'Saint-Martin': 'MAF',
+    'Svalbard and Jan Mayen Islands': 'SJM',
+    'Taiwan, Republic of China': 'TWN',
+    'Turkey': 'TUR',
+    'US Minor Outlying Islands': 'UMI',
+    'Virgin Islands, US': 'VIR',
+    'Wallis and Futuna Islands': 'WLF',
+}
+
+def canonical_continent(name):
+    """
+    Continent grouping without stray whitespace ('Europe ' -> 'Europe')
+    """
+    return str(name).strip()
+
+def _outline_table():
+    # ISO3, outline name and main-landmass bounding box for each country on the world map
+    outlines = pd.read_json(WORLD_BOUNDARIES_PATH, typ='series')['features']
+    rows = []
+    for feature in outlines:
+        geometry = shapely.geometry.shape(feature['geometry'])
+        parts = list(getattr(geometry, 'geoms', [geometry]))
+        mainland = max(parts, key=lambda part: part.area).centroid
+        # Leave out distant territories (French Guiana, Alaska, Chukotka across the antimeridian)
+        nearby = [part for part in parts if part.centroid.distance(mainland) <= MAINLAND_RADIUS]
+        west, south, east, north = shapely.MultiPolygon(nearby).bounds
+        rows.append({
+            'ISO3': feature['properties']['iso_a3'],
+            'Outline Name': feature['properties']['name'],
+            'South': south, 'West': west, 'North': north, 'East': east,
+        })
+    return pd.DataFrame(rows)
+
+def build_country_reference():
+    """
+    Build the reference table from the remittance workbook, ISO 3166 and the world outlines
+    """
+    try:
+        import pycountry
+    except ImportError as e:
+        raise ImportError("Building the country reference needs pycountry (pip install pycountry)") from e
+
+    remittances = read_source('ofw_remittances')
+    countries = remittances[['Country', 'Continent']].drop_duplicates('Country')
+
+    rows = []
+    for country, continent in zip(countries['Country'], countries['Continent']):
+        iso3 = ISO3_OVERRIDES.get(country)
+        if iso3 is None:
+            try:
+                iso3 = pycountry.countries.lookup(country).alpha_3
+            except LookupError:
+                iso3 = pycountry.countries.search_fuzzy(country)[0].alpha_3
+        record = pycountry.countries.get(alpha_3=iso3)
+        aliases = {getattr(record, field, None) for field in ('name', 'official_name', 'common_name')} if record else set()
+        rows.append({'Country': country, 'ISO3': iso3, 'Continent': canonical_continent(continent), 'Aliases': aliases})
+
+    reference = pd.DataFrame(rows).merge(_outline_table(), on='ISO3', how='left')
+    reference['Aliases'] = [
+        '|'.join(sorted(alias for alias in aliases | {outline} if isinstance(alias, str) and alias != country))
+        for country, aliases, outline in zip(reference['Country'], reference['Aliases'], reference['Outline Name'])
+    ]
+    reference[BOUNDS_COLUMNS] = reference[BOUNDS_COLUMNS].round(3)
+    return reference[['Country', 'Aliases', 'ISO3', 'Continent'] + BOUNDS_COLUMNS].sort_values('Country')
+
+@st.cache_resource(show_spinner=False)
+def load_country_reference():
+    """
+    The reference table with lookups built once per process
+    """
+    reference = pd.read_csv(REFERENCE_PATH, keep_default_na=False, na_values=[''])
+    aliases = reference[['Country', 'Aliases']].assign(Alias=reference['Aliases'].fillna('').str.split('|')).explode('Alias')
+    names = pd.concat([
+        pd.Series(reference['Country'].values, index=reference['Country'].str.casefold()),
+        pd.Series(aliases['Country'].values, index=aliases['Alias'].str.casefold()),
+        pd.Series(reference['Country'].values, index=reference['ISO3'].str.casefold()),
+    ])
+    names = names[names.index != ''].groupby(level=0).first()
+
+    boxes = reference.dropna(subset=BOUNDS_COLUMNS)
+    continent_bounds = {
+        continent: [[group['South'].min(), group['West'].min()], [group['North'].max(), group['East'].max()]]
+        for continent, group in boxes.groupby('Continent')
+    }
+    return {
+        'table': reference,
+        'names': names,
+        'iso3': reference.set_index('Country')['ISO3'],
+        'continent_bounds': continent_bounds,
+    }
+
+def canonical_country(names):
+    """
+    Canonical workbook names for a Series of country names, aliases or ISO3 codes (NaN if unknown)
+    """
+    lookup = load_country_reference()['names']
+    return names.astype(str).str.strip().str.casefold().map(lookup)
+
+def country_iso3(names):
+    """
+    ISO3 codes for a Series of country names or aliases
+    """
+    return canonical_country(names).map(load_country_reference()['iso3'])
+
+def continent_bounds(continent):
+    """
+    [[south, west], [north, east]] for a continent grouping, or None if unknown
+    """
+    return load_country_reference()['continent_bounds'].get(canonical_continent(continent))
+
+if __name__ == '__main__':
+    reference = build_country_reference()
+    tmp_path = f"{REFERENCE_PATH}.{os.getpid()}.tmp"
+    reference.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, REFERENCE_PATH)
+
+    on_map = reference['South'].notna()
+    print(f"Wrote {len(reference)} countries to {REFERENCE_PATH}; {on_map.sum()} have outlines on the world map")
+    print("Continent bounds:")
+    for continent, group in reference[on_map].groupby('Continent'):
+        print(f"  {continent:<24} S {group['South'].min():7.2f}  W {group['West'].min():8.2f}  "
+              f"N {group['North'].max():7.2f}  E {group['East'].max():8.2f}")
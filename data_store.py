@@ -0,0 +1,295 @@
+"""
+Columnar store for the workbooks and CSVs under data/.
+
+Each source is parsed once into a typed Parquet file under data/parquet/ and
+recorded in a manifest together with the SHA-256 of the source file. Pages
+read the memory-mapped Parquet files instead of parsing Excel with openpyxl,
+and a table is only rebuilt when its source file changes.
+
+Build every table ahead of time with:
+
+    python data_store.py [--force]
+"""
+
+import os
+import json
+import hashlib
+import argparse
+from datetime import datetime, timezone
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import streamlit as st
+
+PARQUET_DIR = 'data/parquet'
+MANIFEST_PATH = os.path.join(PARQUET_DIR, 'manifest.json')
+
+WEALTH_NUMERIC_COLUMNS = ['City/Municipality Total GDP', 'GDP Growth (%)', 'Poverty Rate (%)',
+                          'Annual LGU Income', 'Condominium', 'Retail Hubs', 'Developers',
+                          'Car Showrooms', 'International Schools', 'Hospitals',
+                          'Luxury Hotel Presence', 'Casinos', 'MSMEs']
+
+BRANCH_NUMERIC_COLUMNS = ['Latitude', 'Longitude', 'Rating', 'User Ratings Count']
+
+# name -> how to read the source and which columns must be numeric
+SOURCES = {
+    'wealth_indicator': {
+        'path': 'data/Wealth Indicator.xlsx',
+        'sheet_name': 'City Municipality',
+        'numeric': WEALTH_NUMERIC_COLUMNS,
+    },
+    'msmes': {
+        'path': 'data/Wealth Indicator.xlsx',
+        'sheet_name': 'MSMEs',
+        'numeric': ['MSMEs'],
+    },
+    'ofw_remittances': {
+        'path': 'data/OFW Cash Remittances - All Countries.xlsx',
+        'sheet_name': 0,
+        'numeric': ['Value in thousand USD', 'Value'],
+        'integer': ['Year'],
+    },
+    'remittance_modes': {
+        'path': 'data/Cash Remittances by Mode.xlsx',
+        'sheet_name': 'Mode of Remittance',
+        'numeric': ['Total Cash Remittance'],
+    },
+    'regional_ofw_employment': {
+        'path': 'data/Regional OFW Employment Statistics.xlsx',
+        'sheet_name': 'Regional OFW Employment',
+        'numeric': ['Landbased', 'Seabased'],
+    },
+    'bank_products': {
+        'path': 'data/Bank Products.xlsx',
+        'sheet_name': 'Accounts',
+    },
+    'branches_all': {
+        'path': 'data/Branch Location/ALL_Establishments.csv',
+        'read_csv': {'encoding': 'utf-8-sig'},
+        'numeric': BRANCH_NUMERIC_COLUMNS,
+    },
+    'branches_bpi': {
+        'path': 'data/Branch Location/BPI_LUZON.csv',
+        'read_csv': {'encoding': 'utf-8-sig'},
+        'numeric': BRANCH_NUMERIC_COLUMNS,
+    },
+    'branches_bdo': {
+        'path': 'data/Branch Location/BDO_LUZON.csv',
+        'read_csv': {'encoding': 'utf-8-sig'},
+        'numeric': BRANCH_NUMERIC_COLUMNS,
+    },
+    'branches_unionbank': {
+        'path': 'data/Branch Location/UNIONBANK_LUZON.csv',
+        'read_csv': {'encoding': 'utf-8-sig'},
+        'numeric': BRANCH_NUMERIC_COLUMNS,
+    },
+    'branches_metrobank': {
+        'path': 'data/Branch Location/METROBANK_LUZON.csv',
+        'read_csv': {'encoding': 'utf-8-sig'},
+        'numeric': BRANCH_NUMERIC_COLUMNS,
+    },
+    'branches_landbank': {
+        'path': 'data/Branch Location/LANDBANK_LUZON.csv',
+        'read_csv': {'encoding': 'utf-8-sig'},
+        'numeric': BRANCH_NUMERIC_COLUMNS,
+    },
+    'branches_others': {
+        'path': 'data/Branch Location/OTHERS_LUZON.csv',
+        'read_csv': {'encoding': 'utf-8-sig'},
+        'numeric': BRANCH_NUMERIC_COLUMNS,
+    },
+}
+
+# Bank label used on the Competitor Analysis page -> its branch table
+BRANCH_TABLES = {
+    'BPI': 'branches_bpi',
+    'BDO': 'branches_bdo',
+    'UnionBank': 'branches_unionbank',
+    'Metrobank': 'branches_metrobank',
+    'Landbank': 'branches_landbank',
+    'Other Financial Institutions': 'branches_others',
+}
+
+def file_digest(path, chunk_size=1 << 20):
+    """
+    Return the SHA-256 hex digest of a file
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def read_manifest(manifest_path=MANIFEST_PATH):
+    """
+    Read the manifest of built tables, or an empty one if nothing was built yet
+    """
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def write_manifest(manifest, manifest_path=MANIFEST_PATH):
+    """
+    Atomically replace the manifest so concurrent sessions never read a partial file
+    """
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+def read_source(name):
+    """
+    Parse a source file into a typed DataFrame (the slow path the store avoids)
+    """
+    spec = SOURCES[name]
+
+    if spec['path'].endswith('.csv'):
+        df = pd.read_csv(spec['path'], **spec.get('read_csv', {}))
+    else:
+        df = pd.read_excel(spec['path'], sheet_name=spec.get('sheet_name', 0))
+
+    for col in spec.get('numeric', []):
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+
+    for col in spec.get('integer', []):
+        if col in df.columns:
+            values = pd.to_numeric(df[col], errors='coerce')
+            df[col] = values.astype('Int64') if values.isna().any() else values.astype('int64')
+
+    # Excel columns that mix numbers and text cannot be stored as a single Arrow type
+    for col in df.columns[df.dtypes == object]:
+        values = df[col].dropna()
+        if not values.map(lambda v: isinstance(v, str)).all():
+            df[col] = df[col].map(lambda v: v if pd.isna(v) else str(v))
+
+    return df
+
+def file_state(path):
+    """
+    Cheap fingerprint of a source file used to skip hashing when nothing was touched
+    """
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def source_changed(path, entry, manifest=None, manifest_path=MANIFEST_PATH):
+    """
+    Check whether a source file differs from the one recorded in a manifest entry
+
+    A file that was touched but still has the recorded content gets its new size and mtime
+    written back to the entry (and to the manifest, when given), so it is hashed only once.
+    """
+    state = file_state(path)
+    if state['size'] == entry['size'] and state['mtime_ns'] == entry['mtime_ns']:
+        return False
+
+    # Touched but possibly identical (e.g. a fresh checkout): fall back to the content hash
+    if file_digest(path) != entry['sha256']:
+        return True
+
+    entry.update(state)
+    if manifest is not None:
+        try:
+            write_manifest(manifest, manifest_path)
+        except OSError:
+            pass  # Read-only deployments hash again next time
+    return False
+
+def is_stale(name, manifest=None):
+    """
+    Check whether a table must be rebuilt because its source changed or it was never built
+    """
+    manifest = read_manifest() if manifest is None else manifest
+    entry = manifest.get(name)
+    if entry is None or not os.path.exists(entry['parquet']):
+        return True
+    return source_changed(SOURCES[name]['path'], entry, manifest)
+
+def build_table(name, manifest=None):
+    """
+    Convert one source into Parquet and record it in the manifest
+    """
+    manifest = read_manifest() if manifest is None else manifest
+    spec = SOURCES[name]
+
+    df = read_source(name)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+
+    os.makedirs(PARQUET_DIR, exist_ok=True)
+    parquet_path = os.path.join(PARQUET_DIR, f"{name}.parquet")
+    tmp_path = f"{parquet_path}.{os.getpid()}.tmp"
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, parquet_path)
+
+    manifest[name] = {
+        'source': spec['path'],
+        'sheet_name': spec.get('sheet_name'),
+        'sha256': file_digest(spec['path']),
+        **file_state(spec['path']),
+        'parquet': parquet_path,
+        'rows': table.num_rows,
+        'columns': {field.name: str(field.type) for field in table.schema},
+        'built_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    }
+    write_manifest(manifest)
+    return manifest[name]
+
+def build_all(force=False):
+    """
+    Build every stale table (or all of them with force=True) and return the names built
+    """
+    manifest = read_manifest()
+    built = []
+    for name in SOURCES:
+        if force or is_stale(name, manifest):
+            build_table(name, manifest)
+            built.append(name)
+    return built
+
+def table_version(name):
+    """
+    SHA-256 of a table's source, rebuilding the table first if the source changed
+    """
+    manifest = read_manifest()
+    try:
+        entry = build_table(name, manifest) if is_stale(name, manifest) else manifest[name]
+    except OSError:
+        return file_digest(SOURCES[name]['path'])
+    return entry['sha256']
+
+@st.cache_data(show_spinner=False)
+def _read_parquet(parquet_path, version):
+    # version is the source hash, so a rebuilt table is never served from a stale cache entry
+    return pq.read_table(parquet_path, memory_map=True).to_pandas()
+
+@st.cache_data(show_spinner=False)
+def _read_source_cached(name, state):
+    # Read-only fallback; state (the source's size and mtime) versions the entry
+    return read_source(name)
+
+def load_table(name):
+    """
+    Load a source as a DataFrame from its Parquet copy, rebuilding it first if the source changed
+    """
+    manifest = read_manifest()
+    try:
+        entry = build_table(name, manifest) if is_stale(name, manifest) else manifest[name]
+    except OSError:
+        # Read-only deployments cannot write data/parquet; parse the source directly instead
+        return _read_source_cached(name, tuple(file_state(SOURCES[name]['path']).values()))
+    return _read_parquet(entry['parquet'], entry['sha256'])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the Parquet copies of every source under data/.')
+    parser.add_argument('--force', action='store_true', help='rebuild every table even if its source is unchanged')
+    args = parser.parse_args()
+
+    built = build_all(force=args.force)
+    manifest = read_manifest()
+    for name in SOURCES:
+        status = 'built' if name in built else 'up to date'
+        print(f"{name:<25} {manifest[name]['rows']:>6} rows  {status}")
@@ -0,0 +1,76 @@
+"""
+Normalized table of every bank and financial-institution establishment in Luzon.
+
+The six per-bank branch tables are stacked once per process into a single
+frame with categorical Bank/Region/Province/City columns, float32
+coordinates and a precomputed is_ATM flag. Reviews missing from a bank's
+table are filled from ALL_Establishments.csv by Place ID, so every bank
+and 'All' carry the reviews the branch analyzer reads. Selections by bank and location
+are served from precomputed row positions instead of re-reading and
+re-filtering the CSVs on every rerun.
+"""
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from data_store import BRANCH_TABLES, load_table
+
+LOCATION_COLUMNS = ['Region', 'Province', 'City']
+
+@st.cache_resource(show_spinner=False)
+def load_establishments():
+    """
+    Build the establishments table from the per-bank branch tables
+
+    The returned frame is shared by every session, so treat it as read-only.
+    """
+    dfs = []
+    for bank, table_name in BRANCH_TABLES.items():
+        temp = load_table(table_name)
+        temp['Bank'] = bank
+        dfs.append(temp)
+
+    establishments = pd.concat(dfs, ignore_index=True)
+    establishments = establishments.dropna(subset=['Latitude', 'Longitude']).reset_index(drop=True)
+
+    # Only the BPI table has a Reviews column; fill the other banks' reviews from
+    # ALL_Establishments by Place ID. Its rows without a Reviews field are shifted
+    # (the link sits under Place ID), so they never match.
+    all_reviews = load_table('branches_all').dropna(subset=['Reviews']).drop_duplicates('Place ID')
+    establishments['Reviews'] = establishments['Reviews'].fillna(
+        establishments['Place ID'].map(all_reviews.set_index('Place ID')['Reviews'])
+    )
+
+    establishments['Bank'] = pd.Categorical(establishments['Bank'], categories=list(BRANCH_TABLES))
+    for col in LOCATION_COLUMNS:
+        establishments[col] = establishments[col].astype(str).str.strip().astype('category')
+
+    establishments['Latitude'] = establishments['Latitude'].astype('float32')
+    establishments['Longitude'] = establishments['Longitude'].astype('float32')
+    establishments['is_ATM'] = establishments['Types'].str.contains('ATM', na=False)
+
+    return establishments
+
+@st.cache_resource(show_spinner=False)
+def _positions_by(column):
+    # value -> sorted row positions in the establishments table
+    establishments = load_establishments()
+    return {key: np.asarray(positions) for key, positions in
+            establishments.groupby(column, observed=True).indices.items()}
+
+def select_establishments(bank='All', region='All', province='All', city='All'):
+    """
+    Rows of the establishments table matching the selection ('All' leaves a level unfiltered)
+    """
+    establishments = load_establishments()
+    positions = None
+
+    for column, value in zip(['Bank'] + LOCATION_COLUMNS, [bank, region, province, city]):
+        if value == 'All':
+            continue
+        matches = _positions_by(column).get(value, np.empty(0, dtype=np.intp))
+        positions = matches if positions is None else np.intersect1d(positions, matches, assume_unique=True)
+
+    if positions is None:
+        return establishments
+    return establishments.iloc[positions]
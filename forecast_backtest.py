@@ -0,0 +1,227 @@
+"""
+Rolling-origin backtest of the remittance forecasters.
+
+Every Country/Type series is cut at a series of forecast origins (every STEP
+months from MIN_TRAIN on). Each engine forecasts the next HORIZON months
+from each cut. The report records:
+
+- accuracy: MAPE overall and per step ahead
+- interval coverage: share of actuals inside mean_ci_lower/mean_ci_upper
+- cost: fit time per forecast, peak Python memory (tracemalloc)
+- robustness: failed forecasts and SARIMAX fits that did not converge
+
+The report is written as JSON together with the engine settings (SARIMAX
+order, horizon, origins) and the data hash, so runs with different orders
+or engines can be compared:
+
+    python forecast_backtest.py [--engines SARIMAX "Seasonal naive"] [--limit 50]
+                                [--order 1,1,1] [--seasonal-order 1,1,1,12]
+                                [--output report.json] [--compare previous.json]
+"""
+
+import os
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+from data_store import SOURCES, file_digest, load_table
+from forecast_engine import forecast_groups
+from forecast_store import ORDER, SEASONAL_ORDER, SarimaxModelStore
+from forecasters import FORECASTERS, SarimaxForecaster, get_forecaster
+
+REPORT_DIR = 'data/backtests'
+
+HORIZON = 6
+MIN_TRAIN = 18
+STEP = 3
+
+def forecast_origins(periods, horizon=HORIZON, min_train=MIN_TRAIN, step=STEP):
+    """
+    Training lengths to cut each series at, leaving `horizon` months to score
+    """
+    return list(range(min_train, periods - horizon + 1, step))
+
+def select_groups(limit=None):
+    """
+    All (Country, Type, series) groups, or the `limit` with the largest remittances
+    """
+    df = load_table('ofw_remittances')
+    groups = forecast_groups(df)
+    if limit:
+        top = set(df.groupby(['Country', 'Type'])['Value'].sum().nlargest(limit).index)
+        groups = [group for group in groups if (group[0], group[1]) in top]
+    return groups
+
+def score_forecasts(forecasts, actual):
+    """
+    Absolute percentage errors per step, interval hits and failures for a batch of forecasts
+
+    actual maps (country, type) to the held-out series; zero actuals are left out of the MAPE.
+    """
+    errors = []  # (step, absolute percentage error)
+    covered = points = failures = 0
+    for country, type_, forecast_df, error in forecasts:
+        if forecast_df is None:
+            failures += 1
+            continue
+        truth = actual[(country, type_)].to_numpy()
+        mean = forecast_df['Forecast'].to_numpy()[:len(truth)]
+        lower = forecast_df['mean_ci_lower'].to_numpy()[:len(truth)]
+        upper = forecast_df['mean_ci_upper'].to_numpy()[:len(truth)]
+
+        steps = np.arange(1, len(truth) + 1)
+        nonzero = (truth != 0) & ~np.isnan(truth)
+        errors.extend(zip(steps[nonzero], np.abs(truth[nonzero] - mean[nonzero]) / np.abs(truth[nonzero])))
+        observed = ~np.isnan(truth)
+        covered += int(np.sum((truth[observed] >= lower[observed]) & (truth[observed] <= upper[observed])))
+        points += int(observed.sum())
+    return errors, covered, points, failures
+
+def make_forecaster(name, model_dir, order=ORDER, seasonal_order=SEASONAL_ORDER):
+    # SARIMAX always fits fresh, in-process, so fit time and convergence are measured
+    if name == 'SARIMAX':
+        store = SarimaxModelStore(model_dir, order, seasonal_order)
+        return SarimaxForecaster(store=store, max_workers=1)
+    return get_forecaster(name)
+
+def backtest_engine(name, groups, horizon=HORIZON, min_train=MIN_TRAIN, step=STEP,
+                    order=ORDER, seasonal_order=SEASONAL_ORDER):
+    """
+    Rolling-origin metrics for one engine over all groups
+    """
+    periods = min(len(series) for _, _, series in groups)
+    origins = forecast_origins(periods, horizon, min_train, step)
+
+    errors, covered, points, failures, forecasts, not_converged = [], 0, 0, 0, 0, 0
+    seconds = 0.0
+    tracemalloc.start()
+    for origin in origins:
+        train = [(country, type_, series.iloc[:origin]) for country, type_, series in groups]
+        actual = {(country, type_): series.iloc[origin:origin + horizon] for country, type_, series in groups}
+
+        # A new forecaster per origin, so a SARIMAX fit from an earlier cut is never extended
+        with tempfile.TemporaryDirectory(prefix='backtest_') as model_dir:
+            forecaster = make_forecaster(name, model_dir, order, seasonal_order)
+            start = time.perf_counter()
+            batch = list(forecaster.forecast_batch(train, steps=horizon))
+            seconds += time.perf_counter() - start
+
+        origin_errors, origin_covered, origin_points, origin_failures = score_forecasts(batch, actual)
+        errors.extend(origin_errors)
+        covered += origin_covered
+        points += origin_points
+        failures += origin_failures
+        forecasts += len(batch)
+        store = getattr(forecaster, 'store', None)
+        not_converged += store.stats['not_converged'] if store is not None else 0
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    ape = np.array([value for _, value in errors])
+    step_of = np.array([step_ahead for step_ahead, _ in errors])
+    return {
+        'origins': origins,
+        'forecasts': forecasts,
+        'mape_pct': round(100 * float(np.mean(ape)), 3) if len(ape) else None,
+        'median_ape_pct': round(100 * float(np.median(ape)), 3) if len(ape) else None,
+        'mape_by_step_pct': {
+            str(h): round(100 * float(np.mean(ape[step_of == h])), 3)
+            for h in range(1, horizon + 1) if np.any(step_of == h)
+        },
+        'ci_coverage_pct': round(100 * covered / points, 3) if points else None,
+        'fit_seconds': round(seconds, 4),
+        'ms_per_forecast': round(1000 * seconds / max(forecasts, 1), 4),
+        'peak_memory_mb': round(peak_bytes / 1e6, 3),
+        'failures': failures,
+        'not_converged': not_converged,
+    }
+
+def run_backtest(engines=None, limit=None, horizon=HORIZON, min_train=MIN_TRAIN, step=STEP,
+                 order=ORDER, seasonal_order=SEASONAL_ORDER):
+    """
+    Backtest every engine and return the report dict
+    """
+    engines = engines or list(FORECASTERS)
+    groups = select_groups(limit)
+    source = SOURCES['ofw_remittances']['path']
+    return {
+        'generated_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'data': {'source': source, 'sha256': file_digest(source), 'series': len(groups)},
+        'config': {
+            'horizon': horizon,
+            'min_train': min_train,
+            'step': step,
+            'order': list(order),
+            'seasonal_order': list(seasonal_order),
+        },
+        'engines': {
+            name: backtest_engine(name, groups, horizon, min_train, step, order, seasonal_order)
+            for name in engines
+        },
+    }
+
+def write_report(report, path=None):
+    """
+    Write a report as JSON (to a timestamped file under REPORT_DIR by default)
+    """
+    if path is None:
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+        path = os.path.join(REPORT_DIR, f"backtest_{stamp}.json")
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    return path
+
+def compare_reports(previous, current):
+    """
+    Lines comparing the headline metrics of two reports engine by engine
+    """
+    metrics = ['mape_pct', 'ci_coverage_pct', 'ms_per_forecast', 'peak_memory_mb', 'failures', 'not_converged']
+    lines = []
+    for name, result in current['engines'].items():
+        before = previous.get('engines', {}).get(name)
+        if before is None:
+            continue
+        changes = []
+        for metric in metrics:
+            old, new = before.get(metric), result.get(metric)
+            if old is not None and new is not None:
+                changes.append(f"{metric} {old:g} -> {new:g}")
+        lines.append(f"{name}: " + ', '.join(changes))
+    return lines
+
+def _parse_order(text):
+    return tuple(int(part) for part in text.split(','))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rolling-origin backtest of the remittance forecasters.')
+    parser.add_argument('--engines', nargs='+', choices=list(FORECASTERS), help='engines to evaluate (default: all)')
+    parser.add_argument('--limit', type=int, default=None, help='only the N series with the largest remittances')
+    parser.add_argument('--horizon', type=int, default=HORIZON)
+    parser.add_argument('--min-train', type=int, default=MIN_TRAIN)
+    parser.add_argument('--step', type=int, default=STEP)
+    parser.add_argument('--order', type=_parse_order, default=ORDER, help='SARIMAX order, e.g. 1,1,1')
+    parser.add_argument('--seasonal-order', type=_parse_order, default=SEASONAL_ORDER, help='e.g. 1,1,1,12')
+    parser.add_argument('--output', help='report path (default: data/backtests/backtest_<time>.json)')
+    parser.add_argument('--compare', help='earlier report to compare against')
+    args = parser.parse_args()
+
+    report = run_backtest(args.engines, args.limit, args.horizon, args.min_train, args.step,
+                          args.order, args.seasonal_order)
+    path = write_report(report, args.output)
+
+    print(f"{report['data']['series']} series, origins {next(iter(report['engines'].values()))['origins']}")
+    for name, result in report['engines'].items():
+        print(f"  {name:<22} MAPE {result['mape_pct']}%  coverage {result['ci_coverage_pct']}%  "
+              f"{result['ms_per_forecast']} ms/forecast  peak {result['peak_memory_mb']} MB  "
+              f"failures {result['failures']}  not converged {result['not_converged']}")
+    print(f"Report written to {path}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            for line in compare_reports(json.load(f), report):
+                print(f"  {line}")
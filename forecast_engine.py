@@ -0,0 +1,189 @@
+"""
+Batch SARIMAX forecasting across a process pool.
+
+Series the model store can already answer are forecast inline. The rest are
+fitted in a process pool shared by every session (workers are spawned once
+per server process; starting one re-imports statsmodels and streamlit, which
+costs far more than a single fit). Small batches and single-CPU hosts are
+fitted inline, since there the pool costs more than it saves; see
+POOL_MIN_SERIES. At most two tasks per worker are queued at a time, and each
+result is yielded as soon as it finishes so the page can draw charts
+progressively.
+
+A fit that runs past the per-model timeout is reported as failed instead of
+holding up the batch. The timeout counts from when a worker actually starts
+the fit (workers report it), not from when the task was queued. The fit
+itself cannot be cancelled (a process pool cannot stop one task), so it
+keeps its worker busy until it finishes. If the pool breaks (a worker
+died), it is discarded and the remaining series are fitted inline.
+
+Workers fit with the same order and seasonal order as the store passed in,
+so a batch fits the same model in the pool as it would inline.
+
+Worker count, timeout and the pool threshold default to the
+PINPOINT_FORECAST_WORKERS, PINPOINT_FORECAST_TIMEOUT and
+PINPOINT_FORECAST_POOL_MIN_SERIES environment variables.
+"""
+
+import os
+import time
+import queue
+import itertools
+import threading
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import streamlit as st
+from forecast_store import SarimaxModelStore, get_model_store, monthly_series
+
+DEFAULT_WORKERS = int(os.environ.get('PINPOINT_FORECAST_WORKERS', min(4, os.cpu_count() or 1)))
+DEFAULT_TIMEOUT = float(os.environ.get('PINPOINT_FORECAST_TIMEOUT', 60))
+
+# Fewer live fits than this run inline: a fit takes ~0.2 s, a cold worker ~2 s to start
+POOL_MIN_SERIES = int(os.environ.get('PINPOINT_FORECAST_POOL_MIN_SERIES', 16))
+
+# Queued tasks per worker; keeps memory bounded for large selections
+QUEUE_DEPTH = 2
+
+_worker_store = None
+_worker_started = None
+
+# task id -> wall-clock time its worker started it (None while queued), for tasks in flight
+_task_ids = itertools.count()
+_start_times = {}
+_start_lock = threading.Lock()
+
+def _init_worker(started):
+    global _worker_started
+    _worker_started = started
+
+def _forecast_task(task_id, country, type_, series, steps, model_dir, order, seasonal_order):
+    # Runs in a worker process; the store is created once per worker and model order
+    global _worker_store
+    _worker_started.put((task_id, time.time()))
+    if (_worker_store is None or _worker_store.model_dir != model_dir
+            or _worker_store.order != order or _worker_store.seasonal_order != seasonal_order):
+        _worker_store = SarimaxModelStore(model_dir, order, seasonal_order)
+    return _worker_store.forecast_series(country, type_, series, steps)
+
+@st.cache_resource(show_spinner=False)
+def _shared_pool(workers):
+    # One pool per process and worker count, with the queue its workers report start times on
+    context = multiprocessing.get_context('spawn')
+    started = context.Queue()
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                   initializer=_init_worker, initargs=(started,))
+    return executor, started
+
+def _record_starts(started):
+    # Move start reports into _start_times; reports for tasks no longer tracked are dropped
+    with _start_lock:
+        while True:
+            try:
+                task_id, started_at = started.get_nowait()
+            except queue.Empty:
+                return
+            if task_id in _start_times:
+                _start_times[task_id] = started_at
+
+def forecast_groups(df):
+    """
+    (Country, Type, monthly series) for every group in a remittance frame
+    """
+    return [(country, type_, monthly_series(group)) for (country, type_), group in df.groupby(['Country', 'Type'])]
+
+def _forecast_inline(store, country, type_, series, steps):
+    try:
+        return country, type_, store.forecast_series(country, type_, series, steps), None
+    except Exception as e:
+        return country, type_, None, str(e)
+
+def iter_forecasts(groups, steps=12, max_workers=None, timeout=None, store=None):
+    """
+    Yield (country, type, forecast_df, error) for every group as each forecast completes
+
+    forecast_df is None when the fit failed or timed out; error then says why.
+    """
+    store = store or get_model_store()
+    max_workers = max_workers or DEFAULT_WORKERS
+    timeout = timeout or DEFAULT_TIMEOUT
+
+    # Stored fits only need the smoother: serve them before touching the pool
+    pending = []
+    for country, type_, series in groups:
+        if store.has_fit(country, type_, series):
+            yield _forecast_inline(store, country, type_, series, steps)
+        else:
+            pending.append((country, type_, series))
+
+    if max_workers <= 1 or (os.cpu_count() or 1) == 1 or len(pending) < POOL_MIN_SERIES:
+        for country, type_, series in pending:
+            yield _forecast_inline(store, country, type_, series, steps)
+        return
+
+    yield from _forecast_in_pool(store, pending, steps, max_workers, timeout)
+
+def _forecast_in_pool(store, pending, steps, workers, timeout):
+    executor, started = _shared_pool(workers)
+    tasks = iter(pending)
+    running = {}  # future -> (country, type, series, task id)
+    retry = []    # tasks lost to a broken pool
+    try:
+        while not retry:
+            # Keep the pool fed without submitting the whole batch up front
+            while len(running) < workers * QUEUE_DEPTH:
+                task = next(tasks, None)
+                if task is None:
+                    break
+                task_id = next(_task_ids)
+                with _start_lock:
+                    _start_times[task_id] = None
+                try:
+                    future = executor.submit(_forecast_task, task_id, *task, steps,
+                                             store.model_dir, store.order, store.seasonal_order)
+                except BrokenProcessPool:
+                    with _start_lock:
+                        _start_times.pop(task_id, None)
+                    retry.append(task)
+                    break
+                running[future] = (*task, task_id)
+            if retry or not running:
+                break
+
+            done, _ = wait(running, timeout=1.0, return_when=FIRST_COMPLETED)
+            for future in done:
+                country, type_, series, task_id = running.pop(future)
+                with _start_lock:
+                    _start_times.pop(task_id, None)
+                try:
+                    yield country, type_, future.result(), None
+                except BrokenProcessPool:
+                    retry.append((country, type_, series))
+                except Exception as e:
+                    yield country, type_, None, str(e)
+
+            # The timeout counts from when a worker started the fit, not from when it was queued
+            _record_starts(started)
+            now = time.time()
+            for future, (country, type_, series, task_id) in list(running.items()):
+                started_at = _start_times.get(task_id)
+                if started_at is not None and now - started_at > timeout:
+                    # Abandoned, not cancelled: the fit keeps its worker until it finishes
+                    running.pop(future)
+                    with _start_lock:
+                        _start_times.pop(task_id, None)
+                    yield country, type_, None, f"timed out after {timeout:g}s"
+    finally:
+        # The pool is shared: withdraw this batch's queued tasks but leave the workers running
+        for future, (_, _, _, task_id) in running.items():
+            future.cancel()
+            with _start_lock:
+                _start_times.pop(task_id, None)
+
+    if retry:
+        # A worker died and took the pool with it: start a fresh one next time, fit the rest here
+        _shared_pool.clear()
+        executor.shutdown(wait=False, cancel_futures=True)
+        for country, type_, series in retry + [task[:3] for task in running.values()] + list(tasks):
+            yield _forecast_inline(store, country, type_, series, steps)
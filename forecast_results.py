@@ -0,0 +1,130 @@
+"""
+Precomputed remittance forecasts for every Country × Type.
+
+The batch job fits every series in 'OFW Cash Remittances - All Countries.xlsx'
+once and writes the forecast, with confidence intervals, to
+data/parquet/forecasts.parquet. Only the longest horizon is stored:
+SARIMAX's step-k forecast does not depend on the horizon, so the 6- and
+12-month views are the first rows of the 24-month one. Each series carries
+the hash of the data it was fitted on, so a series whose history has changed
+is forecast live instead of being served stale.
+
+Run the job with:
+
+    python forecast_results.py [--workers N]
+"""
+
+import os
+import time
+import argparse
+from datetime import datetime, timezone
+
+import pandas as pd
+import streamlit as st
+from data_store import PARQUET_DIR, load_table
+from forecast_store import get_model_store, monthly_series, series_digest
+from forecast_engine import forecast_groups, iter_forecasts
+
+RESULTS_PATH = os.path.join(PARQUET_DIR, 'forecasts.parquet')
+
+HORIZONS = [6, 12, 24]
+
+FORECAST_COLUMNS = ['Date', 'Forecast', 'mean_ci_lower', 'mean_ci_upper', 'Country', 'Type']
+
+def precompute_forecasts(max_workers=None, path=RESULTS_PATH):
+    """
+    Forecast every Country × Type at the longest horizon and write the results table
+    """
+    groups = forecast_groups(load_table('ofw_remittances'))
+    digests = {(country, type_): series_digest(series) for country, type_, series in groups}
+    generated_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+    frames, failures = [], []
+    for country, type_, forecast_df, error in iter_forecasts(groups, steps=max(HORIZONS), max_workers=max_workers):
+        if forecast_df is None:
+            failures.append((country, type_, error))
+            continue
+        forecast_df = forecast_df.reset_index(drop=True)
+        forecast_df['Step'] = range(1, len(forecast_df) + 1)
+        forecast_df['data_sha256'] = digests[(country, type_)]
+        frames.append(forecast_df)
+
+    results = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=FORECAST_COLUMNS + ['Step', 'data_sha256'])
+    results['generated_at'] = generated_at
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    results.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return results, failures
+
+@st.cache_resource(show_spinner=False)
+def _read_results(path, version):
+    results = pd.read_parquet(path)
+    # (country, type) -> (data hash, rows ordered by step)
+    return {
+        key: (group['data_sha256'].iloc[0], group.sort_values('Step').reset_index(drop=True))
+        for key, group in results.groupby(['Country', 'Type'], sort=False)
+    }
+
+def load_forecast_results(path=RESULTS_PATH):
+    """
+    The precomputed forecasts keyed by (Country, Type), or an empty dict if the job has not run
+    """
+    try:
+        version = os.stat(path).st_mtime_ns
+    except OSError:
+        return {}
+    return _read_results(path, version)
+
+def precomputed_forecast(country, type_, series, steps):
+    """
+    The first `steps` precomputed months for a series, or None if missing or out of date
+    """
+    entry = load_forecast_results().get((country, type_))
+    if entry is None:
+        return None
+    data_hash, rows = entry
+    if data_hash != series_digest(series) or len(rows) < steps:
+        return None
+    forecast_df = rows.iloc[:steps][FORECAST_COLUMNS].copy()
+    forecast_df.index = pd.DatetimeIndex(forecast_df['Date'])
+    return forecast_df
+
+def iter_saved_or_live_forecasts(groups, steps=12, max_workers=None, timeout=None):
+    """
+    Yield precomputed forecasts first, then live forecasts for the series without one
+    """
+    live = []
+    for country, type_, series in groups:
+        forecast_df = precomputed_forecast(country, type_, series, steps)
+        if forecast_df is None:
+            live.append((country, type_, series))
+        else:
+            yield country, type_, forecast_df, None
+
+    yield from iter_forecasts(live, steps=steps, max_workers=max_workers, timeout=timeout)
+
+def forecast_group(df_group, steps=12):
+    """
+    Forecast one (Country, Type) group, fitting live only when no precomputed result applies
+    """
+    country = df_group['Country'].iloc[0]
+    type_ = df_group['Type'].iloc[0]
+    series = monthly_series(df_group)
+    forecast_df = precomputed_forecast(country, type_, series, steps)
+    if forecast_df is None:
+        forecast_df = get_model_store().forecast_series(country, type_, series, steps)
+    return forecast_df
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Precompute remittance forecasts for every Country × Type.')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes for the fits')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results, failures = precompute_forecasts(max_workers=args.workers)
+    series_count = results[['Country', 'Type']].drop_duplicates().shape[0]
+    print(f"Wrote {series_count} series × {max(HORIZONS)} months to {RESULTS_PATH} in {time.perf_counter() - start:,.1f}s")
+    for country, type_, error in failures:
+        print(f"  failed: {country} - {type_}: {error}")
@@ -0,0 +1,206 @@
+"""
+Fitted SARIMAX models for the remittance forecasts, kept across reruns and restarts.
+
+Fitting SARIMAX(1,1,1)(1,1,1,12) is the slow part of a forecast. Producing
+any horizon from an already fitted model is cheap. The store keeps one entry
+per (Country, Type, order) under data/models/: the fitted parameters and a
+hash of the series they belong to.
+
+- Same series: the stored parameters are reused and only the Kalman
+  smoother runs, whatever the horizon.
+- The series grew by a few months: the new observations are appended by
+  running the smoother over the longer series with the stored parameters.
+  There is no refit until REFIT_AFTER new months have accumulated.
+- Anything else (history revised, order changed): a full fit, warm-started
+  from the stored parameters when there are any.
+
+Where data/models/ cannot be written, fits are kept only in the in-process
+results cache.
+"""
+
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from statsmodels.tsa.statespace.sarimax import SARIMAX
+from data_store import read_manifest, write_manifest
+
+MODEL_DIR = 'data/models'
+
+ORDER = (1, 1, 1)
+SEASONAL_ORDER = (1, 1, 1, 12)
+
+# Appended months tolerated before the parameters are re-estimated
+REFIT_AFTER = 12
+
+# Fitted results kept in memory per store; the least recently used are dropped beyond this
+RESULTS_CACHE_SIZE = int(os.environ.get('PINPOINT_FORECAST_RESULTS_CACHE', 256))
+
+def monthly_series(df_group):
+    """
+    A (Country, Type) group as a monthly Value series indexed by month start
+    """
+    dates = pd.to_datetime(df_group['Year'].astype(str) + '-' + df_group['Month'], format='%Y-%b')
+    series = pd.Series(df_group['Value'].to_numpy(dtype='float64'), index=dates, name='Value')
+    return series.sort_index().asfreq('MS')
+
+def series_digest(series):
+    """
+    SHA-256 of a series' start month and values
+    """
+    digest = hashlib.sha256(series.index[0].strftime('%Y-%m').encode('utf-8'))
+    digest.update(np.ascontiguousarray(series.to_numpy(dtype='float64')).tobytes())
+    return digest.hexdigest()
+
+class SarimaxModelStore:
+    """
+    Disk-backed store of fitted SARIMAX parameters with a bounded in-process results cache
+    """
+
+    def __init__(self, model_dir=MODEL_DIR, order=ORDER, seasonal_order=SEASONAL_ORDER,
+                 max_results=RESULTS_CACHE_SIZE):
+        self.model_dir = model_dir
+        self.order = tuple(order)
+        self.seasonal_order = tuple(seasonal_order)
+        # (country, type, data hash) -> results, least recently used first; repeated horizons
+        # skip even the smoother. Shared by every session, so bounded and locked.
+        self._results = OrderedDict()
+        self._results_lock = threading.Lock()
+        self.max_results = max_results
+        self.stats = {'reused': 0, 'appended': 0, 'fitted': 0, 'not_converged': 0, 'unsaved': 0}
+
+    def path(self, country, type_):
+        key = f"{country}|{type_}|{self.order}|{self.seasonal_order}"
+        name = hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.model_dir, f"sarimax_{name}.json")
+
+    def _model(self, series):
+        return SARIMAX(series, order=self.order, seasonal_order=self.seasonal_order)
+
+    def _save(self, country, type_, series, results, fit_nobs, converged):
+        entry = {
+            'country': country,
+            'type': type_,
+            'order': list(self.order),
+            'seasonal_order': list(self.seasonal_order),
+            'start': series.index[0].strftime('%Y-%m'),
+            'nobs': len(series),
+            'fit_nobs': fit_nobs,
+            'data_sha256': series_digest(series),
+            'param_names': list(results.param_names),
+            'params': [float(value) for value in results.params],
+            'converged': converged,
+            'updated_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        }
+        try:
+            write_manifest(entry, self.path(country, type_))
+        except OSError:
+            # Read-only deployment: the fit still serves this process from the results cache
+            self.stats['unsaved'] += 1
+        return entry
+
+    def _cached_results(self, cache_key):
+        with self._results_lock:
+            results = self._results.get(cache_key)
+            if results is not None:
+                self._results.move_to_end(cache_key)
+            return results
+
+    def _cache_results(self, cache_key, results):
+        with self._results_lock:
+            self._results[cache_key] = results
+            self._results.move_to_end(cache_key)
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+
+    def _extends(self, entry, series):
+        # Same history as the stored fit plus at most REFIT_AFTER months since the last fit
+        return (entry['start'] == series.index[0].strftime('%Y-%m')
+                and entry['nobs'] < len(series)
+                and series_digest(series.iloc[:entry['nobs']]) == entry['data_sha256']
+                and len(series) - entry['fit_nobs'] <= REFIT_AFTER)
+
+    def get_results(self, country, type_, series):
+        """
+        Results for a series, reusing or extending a stored fit where possible
+        """
+        data_hash = series_digest(series)
+        cache_key = (country, type_, data_hash)
+        results = self._cached_results(cache_key)
+        if results is not None:
+            return results
+
+        entry = read_manifest(self.path(country, type_))
+        params = np.asarray(entry['params']) if entry else None
+        model = self._model(series)
+
+        if entry and entry['data_sha256'] == data_hash:
+            results = model.smooth(params)
+            self.stats['reused'] += 1
+
+        elif entry and self._extends(entry, series):
+            # Same history plus new months: filter the new observations with the stored parameters
+            results = model.smooth(params)
+            self._save(country, type_, series, results, entry['fit_nobs'], entry['converged'])
+            self.stats['appended'] += 1
+
+        else:
+            start_params = params if params is not None and len(params) == len(model.start_params) else None
+            results = model.fit(start_params=start_params, disp=False)
+            converged = bool(results.mle_retvals.get('converged', True)) if results.mle_retvals else True
+            self._save(country, type_, series, results, len(series), converged)
+            self.stats['fitted'] += 1
+            self.stats['not_converged'] += not converged
+
+        self._cache_results(cache_key, results)
+        return results
+
+    def has_fit(self, country, type_, series):
+        """
+        Whether a forecast for this series can be served without fitting
+        """
+        data_hash = series_digest(series)
+        if self._cached_results((country, type_, data_hash)) is not None:
+            return True
+        entry = read_manifest(self.path(country, type_))
+        if not entry:
+            return False
+        if entry['data_sha256'] == data_hash:
+            return True
+        return self._extends(entry, series)
+
+    def forecast_series(self, country, type_, series, steps=12):
+        """
+        Forecast a monthly series for the given number of months
+        """
+        results = self.get_results(country, type_, series)
+
+        forecast_df = results.get_forecast(steps=steps).summary_frame()
+        forecast_df['Date'] = forecast_df.index
+        forecast_df.rename(columns={'mean': 'Forecast'}, inplace=True)
+
+        # Add metadata
+        forecast_df['Country'] = country
+        forecast_df['Type'] = type_
+
+        return forecast_df[['Date', 'Forecast', 'mean_ci_lower', 'mean_ci_upper', 'Country', 'Type']]
+
+    def forecast(self, df_group, steps=12):
+        """
+        Forecast one (Country, Type) group for the given number of months
+        """
+        country = df_group['Country'].iloc[0]
+        type_ = df_group['Type'].iloc[0]
+        return self.forecast_series(country, type_, monthly_series(df_group), steps)
+
+@st.cache_resource(show_spinner=False)
+def get_model_store():
+    """
+    The process-wide model store for the default SARIMAX order
+    """
+    return SarimaxModelStore()
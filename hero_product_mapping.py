@@ -1,72 +1,43 @@
+import json
+import hashlib
 import pandas as pd
 import folium
 import streamlit as st
 import geopandas as gpd
-from langchain.schema import SystemMessage, HumanMessage, AIMessage
-from langchain.chat_models import ChatOpenAI
-from langchain.chains.conversation.memory import ConversationBufferWindowMemory
-from langchain.prompts import (
-    SystemMessagePromptTemplate,
-    HumanMessagePromptTemplate,
-    ChatPromptTemplate,
-    MessagesPlaceholder
-)
-
-def get_region_province_mapping(df):
+from data_store import load_table
+from admin_hierarchy import distribute_to_provinces, luzon_provinces
+from place_crosswalk import load_crosswalk
+from wealth_dataset import city_options, region_province_mapping, wealth_selection
+from wealth_scores import SCOPE_COLUMNS, score_wealth, select_indicator
+from llm_gateway import ANALYST_SYSTEM_MESSAGE, stream_chat
+from prompt_context import wealth_digest
+
+# Unique GADM key behind each shapefile name column; names repeat (about 154 towns in Luzon)
+GADM_KEYS = {'NAME_1': 'GID_1', 'NAME_2': 'GID_2'}
+
+def get_region_province_mapping():
     """
     Get mapping of regions to their provinces from the dataset
     """
-    region_province_mapping = {}
-    for region in df['Region'].unique():
-        provinces = df[df['Region'] == region]['Province'].unique()
-        region_province_mapping[region] = sorted(list(provinces))
-    return region_province_mapping
+    return region_province_mapping()
 
-def get_city_options(df, selected_region, selected_province):
+def get_city_options(selected_region, selected_province):
     """
     Get city/municipality options based on selected region and province
     """
-    filtered_df = df.copy()
-    
-    if selected_region != 'All':
-        filtered_df = filtered_df[filtered_df['Region'] == selected_region]
-    
-    if selected_province != 'All':
-        filtered_df = filtered_df[filtered_df['Province'] == selected_province]
-    
-    cities = ['All'] + sorted(filtered_df['City'].unique().tolist())
-    return cities
+    return city_options(selected_region, selected_province)
 
-def filter_data_by_region_province(df, selected_region, selected_province):
+def filter_data_by_region_province(selected_region, selected_province):
     """
-    Filter the dataframe based on selected region and province
+    Filter the dataset based on selected region and province (a read-only view)
     """
-    filtered_df = df.copy()
-    
-    if selected_region != 'All':
-        filtered_df = filtered_df[filtered_df['Region'] == selected_region]
-    
-    if selected_province != 'All':
-        filtered_df = filtered_df[filtered_df['Province'] == selected_province]
-    
-    return filtered_df
+    return wealth_selection(selected_region, selected_province)
 
-def filter_data_by_all_selections(df, selected_region, selected_province, selected_city):
+def filter_data_by_all_selections(selected_region, selected_province, selected_city):
     """
-    Filter the dataframe based on all selections: region, province, and city
+    Filter the dataset based on all selections: region, province, and city (a read-only view)
     """
-    filtered_df = df.copy()
-    
-    if selected_region != 'All':
-        filtered_df = filtered_df[filtered_df['Region'] == selected_region]
-    
-    if selected_province != 'All':
-        filtered_df = filtered_df[filtered_df['Province'] == selected_province]
-        
-    if selected_city not in ['All', 'N/A']:
-        filtered_df = filtered_df[filtered_df['City'] == selected_city]
-    
-    return filtered_df
+    return wealth_selection(selected_region, selected_province, selected_city)
 
 def determine_scope_from_filters(selected_region, selected_province, selected_city=None):
     """
@@ -101,88 +72,35 @@ def format_large_values(value, metric_name):
     else:
         return f"{value:,.0f}"
 
-@st.cache_data
 def process_wealth_data(df, scope, indicator):
     """
     Process wealth data based on scope (Regional/Provincial/City) and indicator
+
+    Works on any frame without caching; the page reads cached scores through wealth_scores.
     """
     try:
         if df.empty:
             return pd.DataFrame()
-            
-        numeric_columns = ['City/Municipality Total GDP', 'GDP Growth (%)', 'Poverty Rate (%)', 
-                          'Annual LGU Income', 'Condominium', 'Retail Hubs', 'Developers', 
-                          'Car Showrooms', 'International Schools', 'Hospitals', 
-                          'Luxury Hotel Presence', 'Casinos']
-        
-        for col in numeric_columns:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-        
-        if scope == 'Regional':
-            group_column = 'Region'
-        elif scope == 'Provincial':
-            group_column = 'Province'
-        else:
-            group_column = 'City'
-        
-        if indicator == 'All':
-            additive_metrics = ['City/Municipality Total GDP', 'Annual LGU Income', 
-                              'Condominium', 'Retail Hubs', 'Developers', 'Car Showrooms',
-                              'International Schools', 'Hospitals', 'Luxury Hotel Presence', 'Casinos']
-            
-            percentage_metrics = ['GDP Growth (%)', 'Poverty Rate (%)']
-            
-            grouped = df.groupby(group_column).agg({
-                **{metric: 'sum' for metric in additive_metrics if metric in df.columns},
-                **{metric: 'mean' for metric in percentage_metrics if metric in df.columns}
-            }).reset_index()
-            
-            wealth_score = 0
-            
-            if 'City/Municipality Total GDP' in grouped.columns:
-                wealth_score += grouped['City/Municipality Total GDP'] * 0.5
-            
-            if 'Annual LGU Income' in grouped.columns:
-                wealth_score += grouped['Annual LGU Income'] * 0.2
-            
-            infrastructure_cols = ['Condominium', 'Retail Hubs', 'Developers', 'Car Showrooms',
-                                 'International Schools', 'Hospitals', 'Luxury Hotel Presence', 'Casinos']
-            infrastructure_score = 0
-            for col in infrastructure_cols:
-                if col in grouped.columns:
-                    infrastructure_score += grouped[col]
-            wealth_score += infrastructure_score * 0.2
-            
-            if 'Poverty Rate (%)' in grouped.columns:
-                max_poverty = grouped['Poverty Rate (%)'].max()
-                if max_poverty > 0:  # Avoid division by zero
-                    poverty_penalty = (grouped['Poverty Rate (%)'] / max_poverty) * wealth_score * 0.1
-                    wealth_score -= poverty_penalty
-            
-            grouped['Total_Wealth_Score'] = wealth_score
-            return grouped
-            
-        else:
-            if indicator in df.columns:
-                if indicator in ['GDP Growth (%)', 'Poverty Rate (%)']:
-                    grouped = df.groupby(group_column)[indicator].mean().reset_index()
-                else:
-                    grouped = df.groupby(group_column)[indicator].sum().reset_index()
-                return grouped
-            else:
-                st.error(f"Indicator '{indicator}' not found in data")
-                return pd.DataFrame()
-        
+
+        if indicator != 'All' and indicator not in df.columns:
+            st.error(f"Indicator '{indicator}' not found in data")
+            return pd.DataFrame()
+
+        scores = score_wealth(df, SCOPE_COLUMNS.get(scope, 'City'))
+        return select_indicator(scores, indicator)
+
     except Exception as e:
         st.error(f"Error processing wealth data: {str(e)}")
         return pd.DataFrame()
 
 @st.cache_data
 
-def merge_shapefile_data(_gdf, data_df, shapefile_column, data_column, scope=None):
+def merge_shapefile_data(_gdf, data_df, shapefile_column, data_column, scope=None, geometry_key=None):
     """
     Merge shapefile geodataframe with data dataframe
+
+    geometry_key identifies the outlines in _gdf (which is not hashed), e.g.
+    the level and simplification zoom, so cached merges are not reused across them.
     """
     try:
         if data_df.empty:
@@ -193,67 +111,29 @@ def merge_shapefile_data(_gdf, data_df, shapefile_column, data_column, scope=Non
         
         # Special handling for regional data when showing provincial scope
         if data_column == 'Region' and shapefile_column == 'NAME_1' and scope == 'Provincial':
-            # Map regional data to provinces
-            region_to_provinces = {
-                'National Capital Region (NCR)': ['Metropolitan Manila'],
-                'Cordillera Administrative Region (CAR)': ['Abra', 'Apayao', 'Benguet', 'Ifugao', 'Kalinga', 'Mountain Province'],
-                'Ilocos Region (Region I)': ['Ilocos Norte', 'Ilocos Sur', 'La Union', 'Pangasinan'],
-                'Cagayan Valley (Region II)': ['Batanes', 'Cagayan', 'Isabela', 'Nueva Vizcaya', 'Quirino'],
-                'Central Luzon (Region III)': ['Aurora', 'Bataan', 'Bulacan', 'Nueva Ecija', 'Pampanga', 'Tarlac', 'Zambales'],
-                'CALABARZON (Region IV-A)': ['Batangas', 'Cavite', 'Laguna', 'Quezon', 'Rizal'],
-                'MIMAROPA (Region IV-B)': ['Marinduque', 'Occidental Mindoro', 'Oriental Mindoro', 'Palawan', 'Romblon'],
-                'Bicol Region (Region V)': ['Albay', 'Camarines Norte', 'Camarines Sur', 'Catanduanes', 'Masbate', 'Sorsogon'],
-            }
+            # Spread every region over its provinces in one merge
+            province_df = distribute_to_provinces(data_clean, data_column)
             
-            province_data = []
-            for _, row in data_df.iterrows():
-                region = row[data_column]
-                
-                if region in region_to_provinces:
-                    provinces = region_to_provinces[region]
-                    for province in provinces:
-                        province_row = {'Province': province}
-                        for col in row.index:
-                            if col != data_column:
-                                if col == 'Total_Wealth_Score':
-                                    province_row[col] = row[col] / len(provinces)
-                                elif col in ['GDP Growth (%)', 'Poverty Rate (%)']:
-                                    province_row[col] = row[col]
-                                else:
-                                    province_row[col] = row[col] / len(provinces)
-                        province_data.append(province_row)
-            
-            if province_data:
-                province_df = pd.DataFrame(province_data)
-                merged = _gdf.merge(province_df, left_on='NAME_1', right_on='Province', how='left')
+            if not province_df.empty:
+                merged = gdf_clean.merge(province_df, on='GID_1', how='left')
                 return merged
         
         # For city-level data, filter to only Luzon regions to prevent incorrect matching
         if data_column == 'City':
-            # Define Luzon provinces to filter shapefile
-            luzon_provinces = [
-                'Metropolitan Manila', 'Abra', 'Apayao', 'Benguet', 'Ifugao', 'Kalinga', 'Mountain Province',
-                'Ilocos Norte', 'Ilocos Sur', 'La Union', 'Pangasinan', 'Batanes', 'Cagayan', 'Isabela', 
-                'Nueva Vizcaya', 'Quirino', 'Aurora', 'Bataan', 'Bulacan', 'Nueva Ecija', 'Pampanga', 
-                'Tarlac', 'Zambales', 'Batangas', 'Cavite', 'Laguna', 'Quezon', 'Rizal', 'Marinduque', 
-                'Occidental Mindoro', 'Oriental Mindoro', 'Palawan', 'Romblon', 'Albay', 'Camarines Norte', 
-                'Camarines Sur', 'Catanduanes', 'Masbate', 'Sorsogon'
-            ]
-            
-            # Filter shapefile to Luzon provinces only
-            gdf_clean = gdf_clean[gdf_clean['NAME_1'].isin(luzon_provinces)]
+            gdf_clean = gdf_clean[gdf_clean['NAME_1'].isin(luzon_provinces())]
         
         elif data_column == 'Province' and shapefile_column == 'NAME_1':
             # For provincial data, filter shapefile to only provinces that exist in the data
             provinces_in_data = data_clean['Province'].unique()
             gdf_clean = gdf_clean[gdf_clean['NAME_1'].isin(provinces_in_data)]
         
-        # Normalize city names for better matching
+        # Cities join on their GADM key through the prebuilt crosswalk
         if data_column == 'City' and shapefile_column == 'NAME_2':
-            data_clean['City_normalized'] = data_clean['City'].apply(normalize_place_name)
-            gdf_clean['NAME_2_normalized'] = gdf_clean['NAME_2'].apply(normalize_place_name)
+            join_columns = ['Province', 'City'] if 'Province' in data_clean.columns else ['City']
+            crosswalk = load_crosswalk().dropna(subset=['GID_2'])[join_columns + ['GID_2']]
+            keyed = data_clean.merge(crosswalk, on=join_columns, how='inner')
             
-            merged = gdf_clean.merge(data_clean, left_on='NAME_2_normalized', right_on='City_normalized', how='left')
+            merged = gdf_clean.merge(keyed, on='GID_2', how='left')
         else:
             merged = gdf_clean.merge(data_clean, left_on=shapefile_column, right_on=data_column, how='left')
         
@@ -263,35 +143,38 @@ def merge_shapefile_data(_gdf, data_df, shapefile_column, data_column, scope=Non
         st.error(f"Error merging data: {str(e)}")
         return _gdf.copy()
 
-def normalize_place_name(name):
+def add_choropleth_layer(m, merged_gdf, key_column, value_column='Value', label=None,
+                         metric_name='Value', format_value=None, name_column=None, **choropleth_kwargs):
     """
-    Normalize place names for better matching between datasets
+    Add a choropleth whose own GeoJSON layer carries the tooltip, so each polygon is serialized once
+
+    key_column must be unique per polygon (folium maps key -> fill colour); name_column, the
+    name shown in the tooltip, defaults to it.
     """
-    if pd.isna(name):
-        return ""
-    
-    name = str(name).strip()
-    
-    # Common normalization rules
-    replacements = {
-        'Ñ': 'N', 'ñ': 'n',
-        'City of ': '',
-        'Municipality of ': '',
-        ' City': '',
-        ' Municipality': '',
-        'St.': 'Saint',
-        'Sto.': 'Santo',
-        'Sta.': 'Santa',
-        'Mt.': 'Mount',
-    }
-    
-    for old, new in replacements.items():
-        name = name.replace(old, new)
-    
-    # Remove extra spaces and convert to title case
-    name = ' '.join(name.split()).title()
-    
-    return name
+    name_column = name_column or key_column
+    label = label or name_column
+    format_value = format_value or (lambda value: format_large_values(value, metric_name))
+
+    # Only the join key and the tooltip text travel with the geometry
+    layer_gdf = merged_gdf[list(dict.fromkeys([key_column, name_column, value_column, 'geometry']))].copy()
+    layer_gdf['tooltip_name'] = f"{label}: " + layer_gdf[name_column].astype(str)
+    layer_gdf['tooltip_value'] = [
+        f"{metric_name}: {format_value(value)}" if pd.notna(value) else f"{metric_name}: N/A"
+        for value in layer_gdf[value_column]
+    ]
+
+    choropleth = folium.Choropleth(
+        geo_data=layer_gdf[[key_column, 'tooltip_name', 'tooltip_value', 'geometry']].__geo_interface__,
+        data=layer_gdf[[key_column, value_column]],
+        columns=[key_column, value_column],
+        key_on=f'feature.properties.{key_column}',
+        **choropleth_kwargs
+    ).add_to(m)
+
+    choropleth.geojson.add_child(
+        folium.GeoJsonTooltip(['tooltip_name', 'tooltip_value'], labels=False, sticky=True)
+    )
+    return choropleth
 
 def create_wealth_choropleth(gdf, data_df, location_column, value_column='Value'):
     """
@@ -310,26 +193,14 @@ def create_wealth_choropleth(gdf, data_df, location_column, value_column='Value'
             merged_gdf = merged_gdf.dropna(subset=[value_column])
             
             if not merged_gdf.empty:
-                folium.Choropleth(
-                    geo_data=merged_gdf.__geo_interface__,
-                    data=merged_gdf,
-                    columns=[location_column, value_column],
-                    key_on=f'feature.properties.{location_column}',
+                add_choropleth_layer(
+                    m, merged_gdf, location_column, value_column,
+                    format_value=lambda value: f"{value:,.2f}",
                     fill_color='YlOrRd',
                     fill_opacity=0.7,
                     line_opacity=0.2,
                     legend_name='Wealth Indicator Value'
-                ).add_to(m)
-                
-                for idx, row in merged_gdf.iterrows():
-                    if pd.notna(row[value_column]):
-                        folium.GeoJson(
-                            row['geometry'],
-                            style_function=lambda x: {'fillOpacity': 0, 'weight': 0},
-                            tooltip=folium.Tooltip(
-                                f"{location_column}: {row[location_column]}<br>Value: {row[value_column]:,.2f}"
-                            )
-                        ).add_to(m)
+                )
         
         return m
         
@@ -406,11 +277,22 @@ def format_wealth_data(df):
         st.error(f"Error formatting data: {str(e)}")
         return df
 
-def hero_product_ai_analysis(region, province, indicator, data, openai_api_key):
+def analysis_fingerprint(region, province, indicator, data):
+    """
+    SHA-256 of the inputs the hero product analysis depends on (the frame by its content)
+    """
+    digest = hashlib.sha256(json.dumps([region, province, indicator], default=str).encode('utf-8'))
+    if data is not None and not data.empty:
+        digest.update(json.dumps(list(map(str, data.columns))).encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(data, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
 
-    bank_products_df = pd.read_excel("data/Bank Products.xlsx", sheet_name='Accounts')
+def hero_product_prompt(region, province, indicator, data):
+    """
+    The hero product analysis prompt for a selection
+    """
+    bank_products_df = load_table('bank_products')
 
-    # --- Prompt ---
     prompt = f"""
     You are a strategic financial analyst for BPI Bank.
 
@@ -418,7 +300,7 @@ def hero_product_ai_analysis(region, province, indicator, data, openai_api_key):
     - Selected region: {region}
     - Selected province: {province}
     - Selected wealth indicator: {indicator}
-    - Data : {data}
+    - Data : {wealth_digest(data, indicator)}
     - Bank Products: {bank_products_df.to_markdown(index=False)}
 
     Your task is to:  
@@ -437,66 +319,51 @@ def hero_product_ai_analysis(region, province, indicator, data, openai_api_key):
     3. [Product] → [Reasoning]
     ...
     """
+    return prompt
 
-     # --- LLM Setup ---
-    llm = ChatOpenAI(
-        openai_api_key=openai_api_key,
-        model_name="gpt-4o-mini",
-        temperature=0
-    )
+def hero_product_ai_analysis(region, province, indicator, data, openai_api_key):
 
     # --- Conversation State ---
     if "hero_product_messages" not in st.session_state:
         st.session_state.hero_product_messages = []
 
-    if "hero_last_inputs" not in st.session_state:
-        st.session_state.last_inputs = {
-            "region": None,
-            "province": None,
-            "indicator": None,
-            "data": pd.DataFrame(),
-        }
+    if "hero_analysis_stats" not in st.session_state:
+        st.session_state.hero_analysis_stats = {"calls": 0, "skipped": 0}
 
-    # Check if inputs changed
-    inputs_changed = (
-        st.session_state.last_inputs["region"] != region or
-        st.session_state.last_inputs["province"] != province or
-        st.session_state.last_inputs["indicator"] != indicator or
-        not st.session_state.last_inputs["data"].equals(data)
-    )
+    # Only a change in region, province, indicator or the data itself needs a new analysis;
+    # map clicks and other widget interactions reuse the stored one
+    fingerprint = analysis_fingerprint(region, province, indicator, data)
+    stats = st.session_state.hero_analysis_stats
 
-    # Generate analysis if inputs changed
-    if inputs_changed is not None:
-        response = llm([
-            SystemMessage(content="You are a strategic financial analyst for BPI Bank."),
-            HumanMessage(content=prompt)
-        ])
-        st.session_state.hero_product_messages = [{"role": "assistant", "content": response.content}]
-
-        # Save last inputs
-        st.session_state.hero_last_inputs = {
-            "region": region,
-            "province": province,
-            "indicator": indicator,
-            "data": data,
-        }
+    if fingerprint != st.session_state.get("hero_analysis_fingerprint"):
+        prompt = hero_product_prompt(region, province, indicator, data)
 
-    # --- Display Messages ---
-    for msg in st.session_state.hero_product_messages:
-        with st.chat_message(msg["role"]):
-            st.markdown(msg["content"])
+        with st.chat_message("assistant"):
+            response = st.write_stream(
+                stream_chat([ANALYST_SYSTEM_MESSAGE, {"role": "user", "content": prompt}], openai_api_key, source='hero_product')
+            )
+        st.session_state.hero_product_messages = [{"role": "assistant", "content": response}]
+        st.session_state.hero_analysis_fingerprint = fingerprint
+        stats["calls"] += 1
+    else:
+        stats["skipped"] += 1
+
+        # --- Display Messages ---
+        for msg in st.session_state.hero_product_messages:
+            with st.chat_message(msg["role"]):
+                st.markdown(msg["content"])
+
+    st.caption(f"Analysis generated {stats['calls']} time(s) this session; "
+               f"{stats['skipped']} rerun(s) reused it because the inputs were unchanged")
 
     # --- User Chat Input ---
     if user_input := st.chat_input("Ask about the strategy or insights..."):
         st.session_state.hero_product_messages.append({"role": "user", "content": user_input})
 
-        messages = [SystemMessage(content="You are a strategic financial analyst for BPI Bank.")] + [
-            HumanMessage(content=m["content"]) if m["role"] == "user" else AIMessage(content=m["content"])
-            for m in st.session_state.hero_product_messages
+        messages = [ANALYST_SYSTEM_MESSAGE] + [
+            {"role": m["role"], "content": m["content"]} for m in st.session_state.hero_product_messages
         ]
 
-        response = llm(messages)
-        st.session_state.hero_product_messages.append({"role": "assistant", "content": response.content})
-
         with st.chat_message("assistant"):
-            st.markdown(response.content)
\ No newline at end of file
+            response = st.write_stream(stream_chat(messages, openai_api_key, source='hero_product'))
+        st.session_state.hero_product_messages.append({"role": "assistant", "content": response})
\ No newline at end of file
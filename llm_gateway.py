@@ -0,0 +1,397 @@
+"""
+Shared gateway for the AI analyzers' chat completions.
+
+The Hero Product, Pop-Up Strategy and Branch analyzers send their prompts
+through the gateway, which answers from a persistent SQLite cache when it can.
+Responses are keyed by the SHA-256 of (model, temperature, messages), so an
+identical selection is answered instantly and costs no tokens. Entries
+expire after PINPOINT_LLM_CACHE_TTL seconds (default 7 days), and the least
+recently used entries are evicted beyond PINPOINT_LLM_CACHE_MAX_ENTRIES
+(default 1000). A cache that cannot be opened or written (a read-only
+deployment, a database locked by another session) is skipped with a
+warning; the reply is still generated, just not cached.
+
+Replies are generated on a background thread pool (PINPOINT_LLM_WORKERS,
+default 4) and streamed: stream_chat() returns at once, and the page renders
+the reply token by token with st.write_stream while everything above it has
+already painted. Time to first token and total latency are logged
+separately for every request. Identical requests made while one is already
+being generated (several sessions opening the same page) share that one
+call: each later caller replays what has arrived so far, then follows it live.
+
+Hits, misses, errors, latency, time to first token and tokens spent or saved
+are counted per analyzer for the life of the process; see llm_metrics().
+
+Completions come from the provider configured in llm_providers (OpenAI by
+default, or the in-process fake for offline runs and load tests). Replies
+from a provider other than OpenAI are cached under their own keys.
+
+Inspect or clear the cache with:
+
+    python llm_gateway.py [--clear]
+"""
+
+import os
+import json
+import time
+import logging
+import sqlite3
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+from llm_providers import get_provider
+
+CACHE_PATH = os.environ.get('PINPOINT_LLM_CACHE_PATH', 'data/llm_cache.sqlite')
+CACHE_TTL = float(os.environ.get('PINPOINT_LLM_CACHE_TTL', 7 * 24 * 3600))
+CACHE_MAX_ENTRIES = int(os.environ.get('PINPOINT_LLM_CACHE_MAX_ENTRIES', 1000))
+
+# Requests generated in the background at once, across all sessions
+MAX_WORKERS = int(os.environ.get('PINPOINT_LLM_WORKERS', 4))
+
+DEFAULT_MODEL = 'gpt-4o-mini'
+
+ANALYST_SYSTEM_MESSAGE = {'role': 'system', 'content': 'You are a strategic financial analyst for BPI Bank.'}
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    temperature REAL NOT NULL,
+    response TEXT NOT NULL,
+    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+    completion_tokens INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+def prompt_key(model, temperature, messages):
+    """
+    SHA-256 of the model, temperature and rendered messages
+    """
+    payload = json.dumps({'model': model, 'temperature': temperature, 'messages': messages},
+                         sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class ResponseCache:
+    """
+    SQLite response store with a TTL and least-recently-used eviction
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(SCHEMA)
+
+    def _connect(self):
+        # A connection per operation: Streamlit serves each session from its own thread
+        return sqlite3.connect(self.path, timeout=10)
+
+    def get(self, key):
+        """
+        (response, prompt_tokens, completion_tokens) for a live entry, or None
+        """
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT response, prompt_tokens, completion_tokens FROM responses WHERE key = ? AND created_at >= ?',
+                (key, now - self.ttl),
+            ).fetchone()
+            if row is not None:
+                conn.execute('UPDATE responses SET last_used = ?, hits = hits + 1 WHERE key = ?', (now, key))
+        return row
+
+    def put(self, key, model, temperature, response, prompt_tokens=0, completion_tokens=0):
+        """
+        Store a response, then drop expired entries and the least recently used beyond the limit
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)',
+                (key, model, temperature, response, prompt_tokens, completion_tokens, now, now),
+            )
+            conn.execute('DELETE FROM responses WHERE created_at < ?', (now - self.ttl,))
+            conn.execute(
+                'DELETE FROM responses WHERE key NOT IN '
+                '(SELECT key FROM responses ORDER BY last_used DESC LIMIT ?)',
+                (self.max_entries,),
+            )
+
+    def summary(self):
+        """
+        Entry count, total hits and size on disk
+        """
+        with self._connect() as conn:
+            entries, hits = conn.execute('SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM responses').fetchone()
+        return {'entries': entries, 'hits': hits, 'bytes': os.path.getsize(self.path)}
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM responses')
+
+class ChatStream:
+    """
+    A reply being generated on the gateway's worker pool; iterate it for text chunks
+
+    Iterating blocks only until the next chunk arrives, so st.write_stream can render
+    the reply token by token. A cached reply arrives as a single chunk. Every
+    iteration starts from the first chunk, so one stream can serve several callers.
+    """
+
+    def __init__(self):
+        self._parts = []
+        self._done = False
+        self._error = None
+        self._changed = threading.Condition()
+        self._followers = []  # (source, perf_counter at join) of callers sharing this reply
+        self.cached = False
+
+    def _put(self, text):
+        with self._changed:
+            self._parts.append(text)
+            self._changed.notify_all()
+
+    def _close(self, error=None):
+        with self._changed:
+            self._error = error
+            self._done = True
+            self._changed.notify_all()
+
+    def __iter__(self):
+        sent = 0
+        while True:
+            with self._changed:
+                self._changed.wait_for(lambda: self._done or len(self._parts) > sent)
+                chunks = self._parts[sent:]
+                done = self._done
+            sent += len(chunks)
+            yield from chunks
+            if done:
+                break
+        if self._error is not None:
+            raise self._error
+
+    def result(self):
+        """
+        The full reply, waiting for it to finish
+        """
+        for _ in self:
+            pass
+        return ''.join(self._parts)
+
+class LLMGateway:
+    """
+    Cached, streamed chat completions with per-analyzer hit/miss, latency and token counters
+    """
+
+    def __init__(self, cache=None, max_workers=MAX_WORKERS, provider=None):
+        if cache is None:
+            try:
+                cache = ResponseCache()
+            except (OSError, sqlite3.Error) as e:
+                # Read-only deployments cannot create data/llm_cache.sqlite; run without caching
+                logger.warning("LLM response cache unavailable, replies will not be cached: %s", e)
+        self.cache = cache
+        self.provider = provider
+        self._providers = {}
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._in_flight = {}  # prompt key -> ChatStream still being generated
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='llm')
+
+    def _provider(self, api_key):
+        # A provider given to the gateway serves every request; otherwise the configured one, per key
+        if self.provider is not None:
+            return self.provider
+        with self._lock:
+            if api_key not in self._providers:
+                self._providers[api_key] = get_provider(api_key)
+            return self._providers[api_key]
+
+    def _prompt_key(self, api_key, model, temperature, messages):
+        # OpenAI replies keep their original keys; other providers' replies never answer for them
+        provider = self._provider(api_key)
+        return prompt_key(model if provider.name == 'openai' else f"{provider.name}:{model}", temperature, messages)
+
+    def _record(self, source, outcome, seconds, tokens=0, first_token_seconds=None):
+        with self._lock:
+            metrics = self._metrics.setdefault(source, {
+                'hits': 0, 'misses': 0, 'errors': 0,
+                'hit_seconds': 0.0, 'miss_seconds': 0.0, 'first_token_seconds': 0.0,
+                'tokens_spent': 0, 'tokens_saved': 0,
+            })
+            metrics[{'hit': 'hits', 'miss': 'misses', 'error': 'errors'}[outcome]] += 1
+            if outcome == 'hit':
+                metrics['hit_seconds'] += seconds
+                metrics['tokens_saved'] += tokens
+            elif outcome == 'miss':
+                metrics['miss_seconds'] += seconds
+                metrics['first_token_seconds'] += first_token_seconds or seconds
+                metrics['tokens_spent'] += tokens
+
+    def _generate(self, stream, key, messages, api_key, model, temperature, source):
+        # Runs on the worker pool: serve from the cache or stream the completion into `stream`.
+        # The stream is always closed, so a page waiting on it can never block forever.
+        start = time.perf_counter()
+        error = None
+        tokens = 0
+        try:
+            provider = self._provider(api_key)
+            key = key or self._prompt_key(api_key, model, temperature, messages)
+            cached = self._cache_call('get', key)
+            if cached is not None:
+                response, prompt_tokens, completion_tokens = cached
+                tokens = prompt_tokens + completion_tokens
+                stream.cached = True
+                stream._put(response)
+                self._record(source, 'hit', time.perf_counter() - start, tokens)
+                return
+
+            parts, usage, first_token = [], None, None
+            for text, chunk_usage in provider.stream(messages, model, temperature):
+                usage = chunk_usage or usage
+                if text:
+                    if first_token is None:
+                        first_token = time.perf_counter() - start
+                    parts.append(text)
+                    stream._put(text)
+
+            total = time.perf_counter() - start
+            prompt_tokens, completion_tokens = usage or (0, 0)
+            tokens = prompt_tokens + completion_tokens
+            self._cache_call('put', key, model, temperature, ''.join(parts), prompt_tokens, completion_tokens)
+            self._record(source, 'miss', total, tokens, first_token)
+            logger.info("LLM %s: first token %.0f ms, total %.0f ms, %d tokens", source,
+                        1000 * (first_token or total), 1000 * total, tokens)
+        except Exception as e:
+            error = e
+            self._record(source, 'error', time.perf_counter() - start)
+            logger.warning("LLM request for %s failed after %.0f ms: %s", source, 1000 * (time.perf_counter() - start), e)
+        finally:
+            # Once out of the in-flight map no caller can join, so the followers list is final
+            with self._lock:
+                if self._in_flight.get(key) is stream:
+                    del self._in_flight[key]
+            stream._close(error)
+            for follower, joined in stream._followers:
+                # A shared reply costs the follower no tokens, like a cache hit
+                if error is None:
+                    self._record(follower, 'hit', time.perf_counter() - joined, tokens)
+                else:
+                    self._record(follower, 'error', time.perf_counter() - joined)
+
+    def _cache_call(self, method, *args):
+        # A locked or read-only cache costs the cached reply, never the request itself
+        if self.cache is None:
+            return None
+        try:
+            return getattr(self.cache, method)(*args)
+        except (OSError, sqlite3.Error) as e:
+            logger.warning("LLM response cache %s failed: %s", method, e)
+            return None
+
+    def start_chat(self, messages, api_key=None, model=DEFAULT_MODEL, temperature=0, source='default'):
+        """
+        Start generating a reply to a list of {'role', 'content'} messages in the background
+
+        A request identical to one still being generated shares its stream instead of starting another.
+        """
+        try:
+            key = self._prompt_key(api_key, model, temperature, messages)
+        except Exception:
+            # The provider could not be created; _generate reports why on the stream
+            key = None
+        with self._lock:
+            stream = self._in_flight.get(key) if key is not None else None
+            if stream is not None:
+                stream._followers.append((source, time.perf_counter()))
+                return stream
+            stream = ChatStream()
+            if key is not None:
+                self._in_flight[key] = stream
+        self._executor.submit(self._generate, stream, key, messages, api_key, model, temperature, source)
+        return stream
+
+    def chat(self, messages, api_key=None, model=DEFAULT_MODEL, temperature=0, source='default'):
+        """
+        The assistant's full reply, from the cache when possible
+        """
+        return self.start_chat(messages, api_key, model, temperature, source).result()
+
+    def metrics(self):
+        """
+        Counters per analyzer, with the hit rate, mean latency of hits and misses and mean time to first token
+        """
+        with self._lock:
+            snapshot = {source: dict(metrics) for source, metrics in self._metrics.items()}
+        for metrics in snapshot.values():
+            lookups = metrics['hits'] + metrics['misses']
+            metrics['hit_rate'] = metrics['hits'] / lookups if lookups else None
+            metrics['mean_hit_ms'] = 1000 * metrics['hit_seconds'] / metrics['hits'] if metrics['hits'] else None
+            metrics['mean_miss_ms'] = 1000 * metrics['miss_seconds'] / metrics['misses'] if metrics['misses'] else None
+            metrics['mean_first_token_ms'] = (1000 * metrics['first_token_seconds'] / metrics['misses']
+                                              if metrics['misses'] else None)
+        return snapshot
+
+@st.cache_resource(show_spinner=False)
+def get_gateway():
+    """
+    The process-wide gateway shared by every session
+    """
+    return LLMGateway()
+
+def chat(messages, api_key=None, model=DEFAULT_MODEL, temperature=0, source='default'):
+    """
+    Send messages through the shared gateway and wait for the full reply
+    """
+    return get_gateway().chat(messages, api_key, model, temperature, source)
+
+def stream_chat(messages, api_key=None, model=DEFAULT_MODEL, temperature=0, source='default'):
+    """
+    Start a reply on the shared gateway's workers; pass the result to st.write_stream
+    """
+    return get_gateway().start_chat(messages, api_key, model, temperature, source)
+
+def llm_metrics():
+    """
+    Hit/miss, latency and token counters per analyzer for this process
+    """
+    return get_gateway().metrics()
+
+def format_llm_metrics(metrics):
+    """
+    One caption line per analyzer describing cache hits, latency and tokens saved
+    """
+    lines = []
+    for source, m in sorted(metrics.items()):
+        hit_rate = f"{m['hit_rate']:.0%}" if m['hit_rate'] is not None else 'n/a'
+        latency = ' · '.join(
+            f"{label} {value:,.0f} ms" for label, value in
+            [('hit', m['mean_hit_ms']), ('first token', m['mean_first_token_ms']), ('miss', m['mean_miss_ms'])]
+            if value is not None
+        )
+        lines.append(f"{source}: {m['hits']} hits / {m['misses']} misses ({hit_rate}) · {latency} · "
+                     f"{m['tokens_saved']:,} tokens saved" + (f" · {m['errors']} errors" if m['errors'] else ''))
+    return '  \n'.join(lines)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Inspect or clear the LLM response cache.')
+    parser.add_argument('--clear', action='store_true', help='delete every cached response')
+    args = parser.parse_args()
+
+    cache = ResponseCache()
+    if args.clear:
+        cache.clear()
+    summary = cache.summary()
+    print(f"{cache.path}: {summary['entries']} responses, {summary['hits']} hits, {summary['bytes'] / 1e6:,.2f} MB")
@@ -0,0 +1,139 @@
+"""
+Chat completion providers behind the LLM gateway.
+
+The gateway asks a provider to stream a reply and never talks to a vendor
+SDK itself. Two providers are registered:
+
+- openai: the OpenAI API (or any OpenAI-compatible server via base_url),
+  with the key from .streamlit/secrets.toml or OPENAI_API_KEY
+- fake:   an in-process stand-in that streams a deterministic reply for each
+  prompt with configurable latency, and spends no tokens or quota
+
+The provider and its settings come from PINPOINT_LLM_* environment variables
+first, then from the [llm] section of .streamlit/secrets.toml:
+
+    PINPOINT_LLM_PROVIDER        provider           openai (default) or fake
+    PINPOINT_LLM_BASE_URL        base_url           OpenAI-compatible endpoint
+    PINPOINT_LLM_FIRST_TOKEN_MS  first_token_ms     fake: delay before the first chunk (300)
+    PINPOINT_LLM_TOKEN_MS        token_ms           fake: delay between chunks (15)
+    PINPOINT_LLM_REPLY_TOKENS    reply_tokens       fake: chunks per reply (150)
+
+With the fake provider the app runs headless, with no secrets file and no
+network, which is how the page benchmarks drive it:
+
+    PINPOINT_LLM_PROVIDER=fake streamlit run app.py
+"""
+
+import os
+import time
+import random
+import hashlib
+from collections import namedtuple
+
+import streamlit as st
+from prompt_context import count_tokens
+
+# One streamed piece of a reply: text, and/or (prompt_tokens, completion_tokens) at the end
+Delta = namedtuple('Delta', ['text', 'usage'])
+
+def llm_setting(name, default=None):
+    """
+    A provider setting from PINPOINT_LLM_<NAME>, then the [llm] section of the secrets, then the default
+    """
+    value = os.environ.get(f'PINPOINT_LLM_{name.upper()}')
+    if value is not None:
+        return value
+    try:
+        return st.secrets.get('llm', {}).get(name, default)
+    except FileNotFoundError:
+        # No secrets file: environment and defaults only
+        return default
+
+def configured_api_key():
+    """
+    The OpenAI key from the secrets, falling back to OPENAI_API_KEY (None when neither is set)
+    """
+    try:
+        return st.secrets['api_keys']['openai_key']
+    except (KeyError, FileNotFoundError):
+        return os.environ.get('OPENAI_API_KEY')
+
+class OpenAIProvider:
+    """
+    Streamed chat completions from the OpenAI API
+    """
+    name = 'openai'
+
+    def __init__(self, api_key=None, base_url=None):
+        from openai import OpenAI
+        self.client = OpenAI(api_key=api_key or configured_api_key(), base_url=base_url)
+
+    def stream(self, messages, model, temperature):
+        completion = self.client.chat.completions.create(
+            model=model,
+            temperature=temperature,
+            messages=messages,
+            stream=True,
+            stream_options={'include_usage': True},
+        )
+        for chunk in completion:
+            text = chunk.choices[0].delta.content if chunk.choices else None
+            usage = (chunk.usage.prompt_tokens, chunk.usage.completion_tokens) if chunk.usage else None
+            if text or usage:
+                yield Delta(text, usage)
+
+class FakeProvider:
+    """
+    Deterministic replies with simulated latency, for offline runs and load tests
+
+    The same messages always produce the same reply, so cached and uncached runs
+    render identical pages.
+    """
+    name = 'fake'
+
+    WORDS = ['remittance', 'growth', 'branch', 'customers', 'seasonal', 'pop-up', 'deposits', 'digital',
+             'demand', 'province', 'wealth', 'opportunity', 'risk', 'service', 'expansion', 'segment']
+
+    def __init__(self, first_token_ms=300, token_ms=15, reply_tokens=150):
+        self.first_token_ms = float(first_token_ms)
+        self.token_ms = float(token_ms)
+        self.reply_tokens = int(reply_tokens)
+
+    def reply(self, messages):
+        """
+        The chunks of the reply to messages, seeded by their content
+        """
+        seed = hashlib.sha256(repr([(m['role'], m['content']) for m in messages]).encode('utf-8')).hexdigest()
+        rng = random.Random(seed)
+        chunks = [f"- Simulated analysis {seed[:8]}:"]
+        while len(chunks) < self.reply_tokens:
+            chunks.append(('\n- ' if rng.random() < 0.08 else ' ') + rng.choice(self.WORDS))
+        return chunks
+
+    def stream(self, messages, model, temperature):
+        prompt_tokens = sum(count_tokens(m['content']) for m in messages)
+        chunks = self.reply(messages)
+        time.sleep(self.first_token_ms / 1000)
+        for i, text in enumerate(chunks):
+            if i:
+                time.sleep(self.token_ms / 1000)
+            yield Delta(text, None)
+        yield Delta(None, (prompt_tokens, len(chunks)))
+
+PROVIDERS = {
+    'openai': lambda api_key=None: OpenAIProvider(api_key, base_url=llm_setting('base_url')),
+    'fake': lambda api_key=None: FakeProvider(
+        first_token_ms=llm_setting('first_token_ms', 300),
+        token_ms=llm_setting('token_ms', 15),
+        reply_tokens=llm_setting('reply_tokens', 150),
+    ),
+}
+
+def get_provider(api_key=None, name=None):
+    """
+    The configured provider (or the one named), using api_key where the provider needs one
+    """
+    name = name or llm_setting('provider', 'openai')
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown LLM provider {name!r}; expected one of {', '.join(PROVIDERS)}")
+    return PROVIDERS[name](api_key)
@@ -0,0 +1,194 @@
+"""
+Crosswalk from Wealth Indicator places to GADM keys.
+
+Every City/Municipality in the Wealth Indicator workbook is matched once,
+within its province, to a GADM level-2 feature: first on the normalized
+name, then on GADM's alternate names (VARNAME_2), then by fuzzy matching
+against the province's remaining features. The result is stored in
+data/place_crosswalk.csv so the map merges are exact joins on GID_2 instead
+of normalizing names on every rerun. The SHA-256 of the Wealth Indicator
+source it was built from is kept in data/place_crosswalk.json, and the
+crosswalk is rebuilt when the workbook changes.
+
+Rebuild the crosswalk and print the match report with:
+
+    python place_crosswalk.py [--force]
+"""
+
+import os
+import argparse
+import difflib
+import pandas as pd
+import geopandas as gpd
+import streamlit as st
+from data_store import read_manifest, read_source, table_version, write_manifest
+from admin_hierarchy import load_admin_hierarchy
+from boundary_cache import SHAPEFILES
+
+CROSSWALK_PATH = 'data/place_crosswalk.csv'
+CROSSWALK_MANIFEST_PATH = 'data/place_crosswalk.json'
+
+# GADM attributes live in the .dbf next to each shapefile; the crosswalk needs no geometry
+GADM_ATTRIBUTES = os.path.splitext(SHAPEFILES[2])[0] + '.dbf'
+
+# Minimum difflib similarity for a fuzzy match
+FUZZY_CUTOFF = 0.85
+
+NAME_REPLACEMENTS = {
+    'Ñ': 'N', 'ñ': 'n',
+    'City of ': '',
+    'Municipality of ': '',
+    ' City': '',
+    ' Municipality': '',
+    'St.': 'Saint',
+    'Sto.': 'Santo',
+    'Sta.': 'Santa',
+    'Mt.': 'Mount',
+}
+
+# Preference when a place matches more than one way
+MATCH_ORDER = ['exact', 'variant', 'fuzzy', 'unmatched']
+
+def normalize_place_names(names):
+    """
+    Normalize a Series of place names for matching between datasets
+    """
+    names = names.fillna('').astype(str).str.strip()
+    for old, new in NAME_REPLACEMENTS.items():
+        names = names.str.replace(old, new, regex=False)
+    # Collapse whitespace and convert to title case
+    return names.str.split().str.join(' ').str.title()
+
+def gadm_name_candidates():
+    """
+    One row per (GADM level-2 feature, normalized name), including alternate names
+    """
+    gadm = gpd.read_file(GADM_ATTRIBUTES, ignore_geometry=True)[['NAME_1', 'GID_2', 'NAME_2', 'VARNAME_2']]
+
+    names = gadm[['NAME_1', 'GID_2', 'NAME_2']].assign(Key=normalize_place_names(gadm['NAME_2']), Match='exact')
+
+    variants = gadm[['NAME_1', 'GID_2', 'NAME_2']].assign(Key=gadm['VARNAME_2'].str.split('|')).explode('Key')
+    variants = variants[variants['Key'].notna() & (variants['Key'] != 'NA')]
+    variants = variants.assign(Key=normalize_place_names(variants['Key']), Match='variant')
+
+    return pd.concat([names, variants], ignore_index=True).drop_duplicates(['NAME_1', 'GID_2', 'Key'])
+
+def fuzzy_match(unmatched, candidates):
+    """
+    Closest remaining GADM feature in the same province for each unmatched place
+    """
+    rows = []
+    for province, places in unmatched.groupby('Province', sort=False):
+        pool = candidates[candidates['NAME_1'] == province].drop_duplicates('Key').set_index('Key')
+        for key in places['Key']:
+            close = difflib.get_close_matches(key, pool.index.tolist(), n=1, cutoff=FUZZY_CUTOFF)
+            if close:
+                rows.append({
+                    'Province': province,
+                    'Key': key,
+                    'GID_2': pool.at[close[0], 'GID_2'],
+                    'NAME_2': pool.at[close[0], 'NAME_2'],
+                    'Score': round(difflib.SequenceMatcher(None, key, close[0]).ratio(), 3),
+                })
+                pool = pool[pool['GID_2'] != rows[-1]['GID_2']]
+    return pd.DataFrame(rows, columns=['Province', 'Key', 'GID_2', 'NAME_2', 'Score'])
+
+def build_crosswalk():
+    """
+    Match every Wealth Indicator place to its GADM GID_1/GID_2
+    """
+    places = read_source('wealth_indicator')[['Region', 'Province', 'City']].drop_duplicates()
+    places = places.assign(Key=normalize_place_names(places['City']))
+    candidates = gadm_name_candidates()
+
+    # Exact and alternate-name matches, preferring the primary GADM name
+    matched = places.merge(candidates, left_on=['Province', 'Key'], right_on=['NAME_1', 'Key'], how='inner')
+    matched['Score'] = 1.0
+    matched['Match'] = pd.Categorical(matched['Match'], categories=MATCH_ORDER, ordered=True)
+    matched = matched.sort_values('Match').drop_duplicates(['Province', 'City'])
+
+    # Fuzzy fallback among the features no exact match has claimed
+    remaining = places.merge(matched[['Province', 'City']], how='left', indicator=True)
+    remaining = remaining[remaining['_merge'] == 'left_only'].drop(columns='_merge')
+    fuzzy = fuzzy_match(remaining, candidates[~candidates['GID_2'].isin(matched['GID_2'])])
+    fuzzy = remaining.merge(fuzzy, on=['Province', 'Key'], how='inner').assign(Match='fuzzy')
+
+    match_columns = ['Province', 'City', 'GID_2', 'NAME_2', 'Match', 'Score']
+    matches = pd.concat([matched[match_columns].astype({'Match': str})]
+                        + ([fuzzy[match_columns]] if not fuzzy.empty else []), ignore_index=True)
+    crosswalk = places.drop(columns='Key').merge(matches, on=['Province', 'City'], how='left')
+    crosswalk['Match'] = crosswalk['Match'].fillna('unmatched')
+
+    hierarchy = load_admin_hierarchy()[['Province', 'GID_1']]
+    crosswalk = crosswalk.merge(hierarchy, on='Province', how='left')
+    return crosswalk[['Region', 'Province', 'City', 'GID_1', 'GID_2', 'NAME_2', 'Match', 'Score']] \
+        .sort_values(['Region', 'Province', 'City']).reset_index(drop=True)
+
+def write_crosswalk(crosswalk, version, path=CROSSWALK_PATH, manifest_path=CROSSWALK_MANIFEST_PATH):
+    """
+    Store the crosswalk and the Wealth Indicator hash it was built from
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    crosswalk.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    write_manifest({'wealth_indicator_sha256': version}, manifest_path)
+    return path
+
+def crosswalk_is_current(version, path=CROSSWALK_PATH, manifest_path=CROSSWALK_MANIFEST_PATH):
+    """
+    Whether the stored crosswalk was built from the Wealth Indicator source with this hash
+    """
+    return (os.path.exists(path)
+            and read_manifest(manifest_path).get('wealth_indicator_sha256') == version)
+
+def load_crosswalk():
+    """
+    The persisted place crosswalk, rebuilt first if the Wealth Indicator source changed
+    """
+    return _load_crosswalk(table_version('wealth_indicator'))
+
+@st.cache_resource(show_spinner=False)
+def _load_crosswalk(version):
+    # version is the Wealth Indicator hash, so an edited workbook never serves a stale crosswalk
+    if crosswalk_is_current(version):
+        return pd.read_csv(CROSSWALK_PATH)
+    crosswalk = build_crosswalk()
+    try:
+        write_crosswalk(crosswalk, version)
+    except OSError:
+        # Read-only deployment: serve the rebuilt crosswalk from memory
+        pass
+    return crosswalk
+
+def match_report(crosswalk):
+    """
+    Match counts by method, overall match rate and the places left off the map
+    """
+    counts = crosswalk['Match'].value_counts().reindex(MATCH_ORDER, fill_value=0)
+    return {
+        'places': len(crosswalk),
+        'counts': counts.to_dict(),
+        'match_rate': float(crosswalk['GID_2'].notna().mean()) if len(crosswalk) else 0.0,
+        'fuzzy': crosswalk.loc[crosswalk['Match'] == 'fuzzy', ['Province', 'City', 'NAME_2', 'Score']],
+        'unmatched': crosswalk.loc[crosswalk['Match'] == 'unmatched', ['Region', 'Province', 'City']],
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the Wealth Indicator to GADM place crosswalk.')
+    parser.add_argument('--force', action='store_true', help='rebuild even if the crosswalk is up to date')
+    args = parser.parse_args()
+
+    version = table_version('wealth_indicator')
+    if args.force or not crosswalk_is_current(version):
+        write_crosswalk(build_crosswalk(), version)
+
+    report = match_report(pd.read_csv(CROSSWALK_PATH))
+    print(f"{report['places']} places, {report['match_rate']:.1%} matched to GADM")
+    for match, count in report['counts'].items():
+        print(f"  {match:<10} {count}")
+    if not report['fuzzy'].empty:
+        print("\nFuzzy matches:")
+        print(report['fuzzy'].to_string(index=False))
+    if not report['unmatched'].empty:
+        print("\nUnmatched (not shown on the map):")
+        print(report['unmatched'].to_string(index=False))
@@ -0,0 +1,293 @@
+"""
+Compact, token-budgeted data digests for the AI analyzers' prompts.
+
+The analyzers used to paste raw frames into their prompts. The branch
+analyzer sent the first 100 establishments with every column (reviews,
+links, place IDs), the Pop-Up analyzer the whole historical-plus-forecast
+table, and the Hero Product analyzer a DataFrame repr. Each builder here
+reduces its frame to aggregates, top/bottom-k tables and trend descriptors,
+and adds sections in priority order until the token budget is spent. Tables
+are cut row by row to fit.
+
+Tokens are counted with tiktoken (pinned in requirements.txt), which matches
+OpenAI's tokenizer. tiktoken downloads the o200k_base encoding on first use
+and caches it under TIKTOKEN_CACHE_DIR (a temporary directory by default).
+Offline or sandboxed deployments should seed that cache once at build time
+and point TIKTOKEN_CACHE_DIR at it in the runtime environment:
+
+    TIKTOKEN_CACHE_DIR=/app/tiktoken python -c "import tiktoken; tiktoken.get_encoding('o200k_base')"
+
+Without tiktoken or its encoding, the usual estimate of 4 characters per
+token is used instead. The default budget per digest is
+PINPOINT_PROMPT_TOKEN_BUDGET (1200 tokens).
+"""
+
+import os
+import re
+import math
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_TOKEN_BUDGET = int(os.environ.get('PINPOINT_PROMPT_TOKEN_BUDGET', 1200))
+
+TOKENIZER_ENCODING = 'o200k_base'  # gpt-4o family
+
+# Rows listed in top/bottom tables before the budget trims them further
+TOP_K = 10
+
+REVIEW_EXCERPT_CHARS = 160
+
+# Placeholder the scraper stores for places without reviews
+NO_REVIEWS = 'No reviews found'
+
+# Frequent words that say nothing about service quality
+STOPWORDS = set("""
+    the and for with this that have has had was were are but not you your they them their there here
+    from very what when where which will would could should been being just only also than then into
+    about after again because before branch bank bpi its it's our out over all any can did does done
+    get got one some such too more most much many other same so no yes of to in is on at as by be an or
+""".split())
+
+@lru_cache(maxsize=1)
+def _encoder():
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.get_encoding(TOKENIZER_ENCODING)
+    except Exception:
+        # The encoding is downloaded on first use unless TIKTOKEN_CACHE_DIR was seeded;
+        # offline machines without it fall back to the estimate
+        return None
+
+def count_tokens(text):
+    """
+    Tokens in text, with tiktoken if available and ~4 characters per token otherwise
+    """
+    encoder = _encoder()
+    if encoder is not None:
+        return len(encoder.encode(text))
+    return math.ceil(len(text) / 4)
+
+def compact_number(value):
+    """
+    1234567 -> '1.23M'; small values keep two decimals
+    """
+    if value is None or pd.isna(value):
+        return 'n/a'
+    for threshold, suffix in [(1e9, 'B'), (1e6, 'M'), (1e3, 'K')]:
+        if abs(value) >= threshold:
+            return f"{value / threshold:,.2f}{suffix}"
+    return f"{value:,.2f}"
+
+def _table_within(df, budget):
+    # Markdown of as many leading rows as fit in the budget, noting the rows left out
+    if df.empty or budget <= 0:
+        return None
+    low, high = 0, len(df)
+    while low < high:
+        rows = (low + high + 1) // 2
+        if count_tokens(df.head(rows).to_markdown(index=False)) <= budget:
+            low = rows
+        else:
+            high = rows - 1
+    if low == 0:
+        return None
+    text = df.head(low).to_markdown(index=False)
+    if low < len(df):
+        text += f"\n({len(df) - low} more rows not shown)"
+    return text
+
+def compose_digest(sections, budget=DEFAULT_TOKEN_BUDGET):
+    """
+    Join (title, text or DataFrame) sections in priority order within a token budget
+
+    Text sections are kept whole or dropped; tables are cut to the rows that fit.
+    """
+    blocks, used = [], 0
+    for title, body in sections:
+        remaining = budget - used - count_tokens(title) - 2
+        if isinstance(body, pd.DataFrame):
+            body = _table_within(body, remaining - 10)
+        if not body or count_tokens(body) > remaining:
+            continue
+        block = f"{title}\n{body}" if title else body
+        blocks.append(block)
+        used += count_tokens(block) + 2
+    return '\n\n'.join(blocks)
+
+def _review_terms(reviews, k=15):
+    words = Counter()
+    for text in reviews.dropna():
+        if text == NO_REVIEWS:
+            continue
+        words.update(word for word in re.findall(r"[a-z']{4,}", text.lower()) if word not in STOPWORDS)
+    return ', '.join(f"{word} ({count})" for word, count in words.most_common(k))
+
+def _excerpt(text, chars=REVIEW_EXCERPT_CHARS):
+    text = ' '.join(str(text).split())
+    return text if len(text) <= chars else text[:chars - 1].rstrip() + '…'
+
+def branch_digest(df, budget=DEFAULT_TOKEN_BUDGET):
+    """
+    Establishment counts, ratings, review themes and weakest/strongest branches
+    """
+    if df.empty:
+        return 'No establishments in the selected area.'
+
+    atms = int(df['is_ATM'].sum())
+    rated = df.dropna(subset=['Rating'])
+    weights = rated['User Ratings Count'].fillna(0)
+    weighted = np.average(rated['Rating'], weights=weights) if weights.sum() > 0 else np.nan
+
+    overview = [
+        f"- Locations: {len(df)} ({len(df) - atms} branches, {atms} ATMs) across "
+        f"{df['City'].nunique()} cities in {df['Province'].nunique()} provinces",
+        '- Banks: ' + ', '.join(f"{bank} {count}" for bank, count in df['Bank'].value_counts().items() if count),
+        '- Status: ' + ', '.join(
+            f"{status} {count}" for status, count in df['Business Status'].fillna('Unknown').value_counts().items()),
+    ]
+    if not rated.empty:
+        overview.append(
+            f"- Google rating: mean {rated['Rating'].mean():.2f}, review-weighted {weighted:.2f}, "
+            f"median {rated['Rating'].median():.1f}; {len(rated)} rated, "
+            f"{int((rated['Rating'] < 3).sum())} below 3.0, {int(weights.sum()):,} ratings in total"
+        )
+
+    branch_columns = ['Branch Name', 'City', 'Rating', 'User Ratings Count']
+    by_rating = rated[rated['User Ratings Count'].fillna(0) >= 3].sort_values(['Rating', 'User Ratings Count'])
+    weakest = by_rating.head(TOP_K)[branch_columns]
+    strongest = by_rating.sort_values(['Rating', 'User Ratings Count'], ascending=False).head(TOP_K)[branch_columns]
+
+    by_city = df.groupby('City', observed=True).agg(
+        Locations=('Branch Name', 'size'),
+        Mean_Rating=('Rating', 'mean'),
+    ).sort_values('Locations', ascending=False).head(TOP_K).reset_index()
+    by_city['Mean_Rating'] = by_city['Mean_Rating'].round(2)
+
+    reviewed = by_rating[by_rating['Reviews'].notna() & (by_rating['Reviews'] != NO_REVIEWS)]
+    excerpts = '\n'.join(
+        f"- {row['Branch Name']} ({row['Rating']:.1f}): {_excerpt(row['Reviews'])}"
+        for _, row in reviewed.head(TOP_K).iterrows()
+    )
+
+    # Priority order: customer feedback before the location breakdowns
+    return compose_digest([
+        ('Overview:', '\n'.join(overview)),
+        ('Most frequent review terms:', _review_terms(df['Reviews'])),
+        ('Lowest-rated branches (3+ ratings):', weakest),
+        ('Review excerpts from the lowest-rated branches:', excerpts),
+        ('Locations by city:', by_city),
+        ('Highest-rated branches (3+ ratings):', strongest),
+    ], budget)
+
+def _trend(values):
+    # Linear trend as % of the mean per month, described in words
+    values = np.asarray(values, dtype='float64')
+    if len(values) < 3 or not np.nanmean(values):
+        return 'n/a'
+    slope = np.polyfit(np.arange(len(values)), values, 1)[0] / np.nanmean(values) * 100
+    direction = 'rising' if slope > 0.5 else 'falling' if slope < -0.5 else 'flat'
+    return f"{direction} ({slope:+.1f}%/mo)"
+
+def remittance_digest(history, forecasts, budget=DEFAULT_TOKEN_BUDGET):
+    """
+    Per Country/Type history and forecast descriptors: totals, growth, trend, seasonality, volatility
+
+    history has Country, Type, Date, Value; forecasts has Country, Type, Date, Forecast and the
+    mean_ci_lower/mean_ci_upper interval.
+    """
+    if history.empty:
+        return 'No remittance history for the selection.'
+
+    history = history.reset_index(drop=True).sort_values('Date')
+    forecasts = forecasts.reset_index(drop=True).sort_values('Date')
+    forecast_series = dict(list(forecasts.groupby(['Country', 'Type'])))
+
+    # The two calendar months with the highest average, for every series in one pass
+    seasonal = history.groupby(['Country', 'Type', history['Date'].dt.month.rename('Month')])['Value'].mean()
+    peaks = seasonal.sort_values(ascending=False, kind='mergesort').groupby(level=['Country', 'Type']).head(2)
+    peak_months = {}
+    for (country, type_, month) in peaks.index:
+        peak_months.setdefault((country, type_), []).append(pd.Timestamp(2000, month, 1).strftime('%b'))
+
+    rows = []
+    for (country, type_), group in history.groupby(['Country', 'Type']):
+        values = group['Value'].to_numpy(dtype='float64')
+        last_12 = values[-12:].sum()
+        prior_12 = values[-24:-12].sum() if len(values) >= 24 else np.nan
+
+        row = {
+            'Country': country,
+            'Type': type_,
+            'Last 12m': compact_number(last_12),
+            'YoY': f"{(last_12 / prior_12 - 1) * 100:+.1f}%" if prior_12 and not np.isnan(prior_12) else 'n/a',
+            'Trend': _trend(values[-12:]),
+            'Peak months': ', '.join(peak_months[(country, type_)]),
+            'Volatility (CV)': f"{np.std(values) / np.mean(values):.2f}" if np.mean(values) else 'n/a',
+            '_total': values.sum(),
+        }
+
+        fore = forecast_series.get((country, type_))
+        if fore is not None:
+            steps = len(fore)
+            forecast_total = fore['Forecast'].sum()
+            recent = values[-steps:].sum()
+            width = (fore['mean_ci_upper'] - fore['mean_ci_lower']).mean() / max(fore['Forecast'].abs().mean(), 1e-9)
+            row.update({
+                f'Next {steps}m': compact_number(forecast_total),
+                'vs last period': f"{(forecast_total / recent - 1) * 100:+.1f}%" if recent else 'n/a',
+                'Forecast trend': _trend(fore['Forecast']),
+                'CI width': f"±{width * 50:.0f}%",
+            })
+        rows.append(row)
+
+    table = pd.DataFrame(rows).sort_values('_total', ascending=False).drop(columns='_total').fillna('n/a')
+    start, end = history['Date'].min(), history['Date'].max()
+    overview = (f"- History: {start:%b %Y} to {end:%b %Y}, {len(table)} series, "
+                f"total {compact_number(history['Value'].sum())}")
+    if not forecasts.empty:
+        overview += f"\n- Forecast: {forecasts['Date'].min():%b %Y} to {forecasts['Date'].max():%b %Y}, " \
+                    f"total {compact_number(forecasts['Forecast'].sum())}"
+    return compose_digest([
+        ('Overview:', overview),
+        ('Per country and type (largest first):', table),
+    ], budget)
+
+def wealth_digest(data, indicator, budget=DEFAULT_TOKEN_BUDGET):
+    """
+    Distribution and top/bottom locations of a wealth indicator (a frame of location columns and Value)
+    """
+    if data is None or data.empty or 'Value' not in data.columns:
+        return 'No indicator data for the selection.'
+
+    locations = [col for col in data.columns if col != 'Value']
+    label = locations[-1] if locations else 'Location'
+    values = data['Value'].dropna()
+    metric = 'Total Wealth Score' if indicator == 'All' else indicator
+
+    # Rates are averaged, so only additive indicators get a total and a concentration figure
+    additive = '%' not in metric
+    overview = (
+        f"- {metric} across {len(values)} {label.lower()} areas: "
+        + (f"total {compact_number(values.sum())}, " if additive else '')
+        + f"mean {compact_number(values.mean())}, median {compact_number(values.median())}, "
+        f"min {compact_number(values.min())}, max {compact_number(values.max())}"
+    )
+    if additive and len(values) >= 10 and values.sum():
+        share = values.nlargest(len(values) // 10).sum() / values.sum()
+        overview += f"\n- Top 10% of areas hold {share:.0%} of the total"
+
+    ranked = data.dropna(subset=['Value']).sort_values('Value', ascending=False)
+    ranked = ranked.assign(Value=ranked['Value'].map(compact_number))
+    if len(ranked) <= TOP_K:
+        return compose_digest([('Overview:', overview), (f'{metric} by area:', ranked)], budget)
+    return compose_digest([
+        ('Overview:', overview),
+        (f'Highest {metric}:', ranked.head(TOP_K)),
+        (f'Lowest {metric}:', ranked.tail(min(TOP_K, len(ranked) - TOP_K)).iloc[::-1]),
+    ], budget)
@@ -0,0 +1,115 @@
+"""
+Pre-indexed OFW remittance table for the Pop-Up Strategy filters.
+
+The remittance table is loaded once per process with categorical
+Continent/Country/Type columns, integer Year/Month and row positions
+precomputed per continent, country, type and year. A filter selection
+gathers the rows of the selected year and the year before, groups them once
+by Year/Continent/Country/Type, and reads the current totals, the
+previous-year delta and the top countries off that one grouped frame.
+Results are memoized per filter tuple, so reruns with unchanged filters
+skip the work entirely.
+"""
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from data_store import load_table
+
+INDEX_COLUMNS = ['Continent', 'Country', 'Type', 'Year']
+GROUP_COLUMNS = ['Year', 'Continent', 'Country', 'Type']
+
+TYPES = ['Land-based', 'Sea-based']
+
+TOP_N = 10
+
+@st.cache_resource(show_spinner=False)
+def load_remittance_index():
+    """
+    The remittance table with compact dtypes and value -> row positions for each filter column
+
+    The returned frame is shared by every session, so treat it as read-only.
+    """
+    df = load_table('ofw_remittances')
+    table = pd.DataFrame({
+        'Continent': df['Continent'].astype('category'),
+        'Country': df['Country'].astype('category'),
+        'Type': df['Type'].astype('category'),
+        'Year': df['Year'].astype('int16'),
+        'Month': pd.to_datetime(df['Month'], format='%b').dt.month.astype('int8'),
+        'Value': df['Value'].astype('float64'),
+    })
+    positions = {
+        column: {key: np.asarray(rows) for key, rows in table.groupby(column, observed=True).indices.items()}
+        for column in INDEX_COLUMNS
+    }
+    return table, positions
+
+def _select(positions, continent, country, type_, years):
+    # Sorted row positions matching the filters; None means every row
+    selected = None
+    filters = [('Continent', continent), ('Country', country)]
+    if type_ in TYPES:
+        filters.append(('Type', type_))
+
+    for column, value in filters:
+        if value == 'All':
+            continue
+        matches = positions[column].get(value, np.empty(0, dtype=np.intp))
+        selected = matches if selected is None else np.intersect1d(selected, matches, assume_unique=True)
+
+    if years is not None:
+        empty = np.empty(0, dtype=np.intp)
+        matches = np.unique(np.concatenate([positions['Year'].get(y, empty) for y in years]))
+        selected = matches if selected is None else np.intersect1d(selected, matches, assume_unique=True)
+    return selected
+
+def _as_frame(values, columns):
+    # Grouped Series -> plain frame with string labels, the shape the page code expects
+    frame = values.reset_index()
+    for column in columns:
+        frame[column] = frame[column].astype(str)
+    return frame
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def query_remittances(continent='All', country='All', type_='Combined', year='All', top_n=TOP_N):
+    """
+    Remittances for a filter selection, computed in one grouped pass
+
+    Returns a dict with:
+    - filtered:      Value per Continent/Country/Type for the selected year (Type is
+                     'Combined' when land- and sea-based are summed)
+    - total:         sum of filtered['Value']
+    - delta:         change against the previous year, formatted (None when year is 'All')
+    - top_countries: the top_n countries by Value, largest first
+    """
+    table, positions = load_remittance_index()
+    years = None if year == 'All' else (int(year), int(year) - 1)
+    rows = _select(positions, continent, country, type_, years)
+    subset = table if rows is None else table.iloc[rows]
+
+    grouped = subset.groupby(GROUP_COLUMNS, observed=True)['Value'].sum()
+    year_values = grouped.index.get_level_values('Year')
+    if years is None:
+        current = grouped.groupby(level=['Continent', 'Country', 'Type'], observed=True).sum()
+        delta = None
+    else:
+        current = grouped[year_values == years[0]].droplevel('Year')
+        previous_total = grouped[year_values == years[1]].sum()
+        delta = f"{current.sum() - previous_total:,.2f}"
+
+    if type_ == 'Combined':
+        filtered = _as_frame(current.groupby(level=['Continent', 'Country'], observed=True).sum(), ['Continent', 'Country'])
+        filtered['Type'] = 'Combined'
+    else:
+        filtered = _as_frame(current, ['Continent', 'Country', 'Type'])
+
+    by_country = current.groupby(level='Country', observed=True).sum()
+    top_countries = _as_frame(by_country.sort_values(ascending=False).head(top_n), ['Country'])
+
+    return {
+        'filtered': filtered,
+        'total': float(current.sum()),
+        'delta': delta,
+        'top_countries': top_countries,
+    }
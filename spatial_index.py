@@ -0,0 +1,138 @@
+"""
+Spatial index over the Luzon bank and financial-institution establishments.
+
+Points are projected onto the unit sphere and stored in a KD-tree, so the
+straight-line (chord) distance between two points is a monotonic function of
+their great-circle distance. That turns haversine radius and k-nearest
+queries into plain Euclidean tree queries that run vectorized over whole
+branch networks at once.
+"""
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from scipy.spatial import cKDTree
+from establishments import load_establishments
+
+EARTH_RADIUS_KM = 6371.0088
+
+def to_unit_vectors(lat, lon):
+    """
+    Convert latitude/longitude in degrees to 3D points on the unit sphere
+    """
+    lat = np.radians(np.asarray(lat, dtype=float))
+    lon = np.radians(np.asarray(lon, dtype=float))
+    cos_lat = np.cos(lat)
+    return np.column_stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)])
+
+def km_to_chord(distance_km):
+    """
+    Great-circle distance in km to chord length on the unit sphere
+    """
+    return 2 * np.sin(np.asarray(distance_km, dtype=float) / (2 * EARTH_RADIUS_KM))
+
+def chord_to_km(chord):
+    """
+    Chord length on the unit sphere to great-circle distance in km
+    """
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord, dtype=float) / 2, 0, 1))
+
+class BranchSpatialIndex:
+    """
+    Radius, k-nearest and bounding-box queries over a DataFrame of points.
+
+    Every query takes scalars or arrays of latitudes/longitudes and returns
+    positions into `frame`, the indexed rows with invalid coordinates removed.
+    """
+
+    def __init__(self, df, lat_column='Latitude', lon_column='Longitude'):
+        self.frame = df.dropna(subset=[lat_column, lon_column]).reset_index(drop=True)
+        self.lat = self.frame[lat_column].to_numpy(dtype=float)
+        self.lon = self.frame[lon_column].to_numpy(dtype=float)
+        self.tree = cKDTree(to_unit_vectors(self.lat, self.lon))
+
+        # Latitude-sorted copy for bounding-box scans
+        self._lat_order = np.argsort(self.lat, kind='stable')
+        self._sorted_lat = self.lat[self._lat_order]
+
+    def __len__(self):
+        return len(self.frame)
+
+    def query_radius(self, lat, lon, radius_km):
+        """
+        Positions of all points within radius_km of each query point (one array per query point)
+        """
+        points = to_unit_vectors(np.atleast_1d(lat), np.atleast_1d(lon))
+        matches = self.tree.query_ball_point(points, r=float(km_to_chord(radius_km)), return_sorted=True)
+        return [np.asarray(m, dtype=np.intp) for m in matches]
+
+    def count_within(self, lat, lon, radius_km):
+        """
+        Number of points within radius_km of each query point
+        """
+        points = to_unit_vectors(np.atleast_1d(lat), np.atleast_1d(lon))
+        return np.asarray(self.tree.query_ball_point(points, r=float(km_to_chord(radius_km)), return_length=True))
+
+    def query_nearest(self, lat, lon, k=1):
+        """
+        Distances (km) and positions of the k nearest points to each query point, shaped (n, k)
+        """
+        if len(self) == 0:
+            n = len(np.atleast_1d(lat))
+            return np.full((n, k), np.nan), np.full((n, k), -1, dtype=np.intp)
+
+        points = to_unit_vectors(np.atleast_1d(lat), np.atleast_1d(lon))
+        k = min(k, len(self))
+        chord, positions = self.tree.query(points, k=k)
+        return chord_to_km(chord).reshape(len(points), k), np.asarray(positions).reshape(len(points), k)
+
+    def query_bbox(self, min_lat, min_lon, max_lat, max_lon):
+        """
+        Positions of all points inside a latitude/longitude bounding box
+        """
+        start = np.searchsorted(self._sorted_lat, min_lat, side='left')
+        stop = np.searchsorted(self._sorted_lat, max_lat, side='right')
+        candidates = self._lat_order[start:stop]
+        lon = self.lon[candidates]
+        return np.sort(candidates[(lon >= min_lon) & (lon <= max_lon)])
+
+@st.cache_resource(show_spinner=False)
+def get_establishment_index():
+    """
+    Spatial index over every establishment in Luzon, built once per process
+    """
+    return BranchSpatialIndex(load_establishments())
+
+@st.cache_resource(show_spinner=False)
+def get_competitor_index(bank):
+    """
+    Spatial index over every establishment that does not belong to the given bank
+    """
+    establishments = get_establishment_index().frame
+    return BranchSpatialIndex(establishments[establishments['Bank'] != bank])
+
+def competitor_proximity(df, bank, radius_km=3):
+    """
+    Competitor density and nearest-competitor distance for each branch in df
+
+    Returns a DataFrame aligned to df.index with the number of competitor
+    establishments within radius_km and the name, bank and distance (km) of
+    the nearest one.
+    """
+    result = pd.DataFrame(index=df.index)
+    if df.empty:
+        return result.assign(**{'Competitors Within Radius': [], 'Nearest Competitor': [],
+                                'Nearest Competitor Bank': [], 'Nearest Competitor (km)': []})
+
+    index = get_competitor_index(bank)
+    lat = df['Latitude'].to_numpy(dtype=float)
+    lon = df['Longitude'].to_numpy(dtype=float)
+
+    distances, positions = index.query_nearest(lat, lon, k=1)
+    nearest = index.frame.iloc[positions[:, 0]]
+
+    result['Competitors Within Radius'] = index.count_within(lat, lon, radius_km)
+    result['Nearest Competitor'] = nearest['Branch Name'].to_numpy()
+    result['Nearest Competitor Bank'] = nearest['Bank'].to_numpy()
+    result['Nearest Competitor (km)'] = distances[:, 0]
+    return result
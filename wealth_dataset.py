@@ -0,0 +1,99 @@
+"""
+Indexed Wealth Indicator dataset for the Hero Product Mapping filters.
+
+The table is loaded once per data version and stably sorted by
+Region/Province/City, so every region, province and city selection is a
+contiguous block of rows. Filtered views are row slices of the shared frame
+(no copy of the data), and the region -> provinces mapping and the city
+options for each selection are precomputed as tuples. A rerun costs a few
+dictionary lookups whatever the size of the dataset.
+
+The version is the source's SHA-256, so a changed workbook is re-indexed on
+the next rerun. Numeric columns are typed once when the
+Parquet table is built (see data_store.WEALTH_NUMERIC_COLUMNS).
+"""
+
+import itertools
+import numpy as np
+import streamlit as st
+from data_store import load_table, table_version
+
+LOCATION_COLUMNS = ['Region', 'Province', 'City']
+
+def load_wealth_dataset():
+    """
+    The Wealth Indicator table with its selection index
+
+    Returns a dict with:
+    - version:    SHA-256 of the source workbook
+    - table:      the rows sorted by Region/Province/City
+    - regions:    region -> tuple of its provinces (regions in workbook order)
+    - selections: (region, province, city) with 'All' wildcards -> slice or row positions
+    - cities:     (region, province) with 'All' wildcards -> tuple of city options
+
+    The table is shared by every session, so treat it and its views as read-only.
+    """
+    return _index_wealth(table_version('wealth_indicator'))
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _index_wealth(version):
+    df = load_table('wealth_indicator')
+
+    # Region order follows the workbook, as the Region filter always has
+    regions = {
+        region: tuple(sorted(df.loc[df['Region'] == region, 'Province'].unique()))
+        for region in df['Region'].unique()
+    }
+
+    table = df.sort_values(LOCATION_COLUMNS, kind='mergesort').reset_index(drop=True)
+
+    selections = {('All', 'All', 'All'): slice(0, len(table))}
+    cities = {('All', 'All'): ('All',) + tuple(sorted(table['City'].unique()))}
+    for rolled_up in itertools.product([False, True], repeat=len(LOCATION_COLUMNS)):
+        keys = [column for column, rolled in zip(LOCATION_COLUMNS, rolled_up) if not rolled]
+        if not keys:
+            continue
+        for values, positions in table.groupby(keys, sort=False).indices.items():
+            values = iter(values if isinstance(values, tuple) else (values,))
+            selection = tuple('All' if rolled else next(values) for rolled in rolled_up)
+            selections[selection] = as_slice(positions)
+            if rolled_up[2]:
+                cities[selection[:2]] = ('All',) + tuple(sorted(table['City'].iloc[positions].unique()))
+
+    return {
+        'version': version,
+        'table': table,
+        'regions': regions,
+        'selections': selections,
+        'cities': cities,
+    }
+
+def as_slice(positions):
+    """
+    Contiguous sorted positions as a slice, so a selection is a view instead of a gather
+    """
+    positions = np.asarray(positions)
+    if positions[-1] - positions[0] + 1 == len(positions):
+        return slice(int(positions[0]), int(positions[-1]) + 1)
+    return positions
+
+def region_province_mapping():
+    """
+    Region -> tuple of its provinces
+    """
+    return load_wealth_dataset()['regions']
+
+def city_options(region='All', province='All'):
+    """
+    'All' followed by the cities/municipalities in the selected region and province
+    """
+    return load_wealth_dataset()['cities'].get((region, province), ('All',))
+
+def wealth_selection(region='All', province='All', city='All'):
+    """
+    Rows for a region/province/city selection ('All' or 'N/A' leaves a level unfiltered)
+    """
+    dataset = load_wealth_dataset()
+    city = 'All' if city == 'N/A' else city
+    rows = dataset['selections'].get((region, province, city), slice(0, 0))
+    return dataset['table'].iloc[rows]
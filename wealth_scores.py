@@ -0,0 +1,221 @@
+"""
+Materialized wealth scores for Hero Product Mapping.
+
+Every indicator is aggregated once per data version at Region, Province and
+City level (sums for additive metrics, means over cities for rates) and
+stored columnar in data/parquet/wealth_scores.parquet, together with the
+infrastructure count the score uses and the source hash it was built from.
+The map, top-10 table and AI context for any selection are row slices of
+that table, found through precomputed slices and positions.
+
+Total_Wealth_Score is
+
+    GDP × gdp + LGU income × lgu_income + infrastructure × infrastructure
+    minus (poverty rate / highest poverty rate in view) × score × poverty_penalty
+
+The weighted sum is one vectorized column per set of weights, so changing
+the weights recomputes that column and nothing else. The poverty penalty is
+normalized within the rows being shown, as it always has been.
+
+Rebuild the table ahead of time with:
+
+    python wealth_scores.py
+"""
+
+import os
+import itertools
+import numpy as np
+import pandas as pd
+import streamlit as st
+from data_store import PARQUET_DIR
+from wealth_dataset import LOCATION_COLUMNS, as_slice, load_wealth_dataset, wealth_selection
+
+SCORES_PATH = os.path.join(PARQUET_DIR, 'wealth_scores.parquet')
+
+SCOPE_COLUMNS = {'Regional': 'Region', 'Provincial': 'Province', 'City': 'City'}
+
+ADDITIVE_METRICS = ['City/Municipality Total GDP', 'Annual LGU Income',
+                    'Condominium', 'Retail Hubs', 'Developers', 'Car Showrooms',
+                    'International Schools', 'Hospitals', 'Luxury Hotel Presence', 'Casinos']
+
+PERCENTAGE_METRICS = ['GDP Growth (%)', 'Poverty Rate (%)']
+
+INFRASTRUCTURE_METRICS = ['Condominium', 'Retail Hubs', 'Developers', 'Car Showrooms',
+                          'International Schools', 'Hospitals', 'Luxury Hotel Presence', 'Casinos']
+
+WEALTH_METRICS = ['City/Municipality Total GDP', 'GDP Growth (%)', 'Poverty Rate (%)',
+                  'Annual LGU Income', 'Condominium', 'Retail Hubs', 'Developers',
+                  'Car Showrooms', 'International Schools', 'Hospitals',
+                  'Luxury Hotel Presence', 'Casinos']
+
+# Total_Wealth_Score weights
+WEIGHTS = {
+    'gdp': 0.5,
+    'lgu_income': 0.2,
+    'infrastructure': 0.2,
+    'poverty_penalty': 0.1,
+}
+
+def _aggregate(df, keys):
+    # Indicator aggregates per group of `keys`, plus the infrastructure count the score uses
+    metrics = [metric for metric in ADDITIVE_METRICS + PERCENTAGE_METRICS if metric in df.columns]
+    grouped = df.groupby(keys).agg({
+        metric: 'sum' if metric in ADDITIVE_METRICS else 'mean' for metric in metrics
+    }).reset_index()
+
+    infrastructure = 0
+    for col in INFRASTRUCTURE_METRICS:
+        if col in grouped.columns:
+            infrastructure += grouped[col]
+    grouped['Infrastructure'] = infrastructure
+    return grouped
+
+def _weighted_sum(scores, weights):
+    # Pre-penalty score; the term order matches the original formula so results are identical
+    wealth_score = 0
+    if 'City/Municipality Total GDP' in scores.columns:
+        wealth_score += scores['City/Municipality Total GDP'] * weights['gdp']
+    if 'Annual LGU Income' in scores.columns:
+        wealth_score += scores['Annual LGU Income'] * weights['lgu_income']
+    wealth_score += scores['Infrastructure'] * weights['infrastructure']
+    return np.asarray(wealth_score, dtype='float64')
+
+def _apply_poverty_penalty(wealth_score, poverty, weights):
+    # Penalty relative to the highest poverty rate among the rows in view; missing rates are
+    # skipped (as Series.max did), and an all-missing view gets no penalty
+    max_poverty = 0 if np.isnan(poverty).all() else np.nanmax(poverty)
+    if max_poverty > 0:  # Avoid division by zero
+        wealth_score = wealth_score - (poverty / max_poverty) * wealth_score * weights['poverty_penalty']
+    return wealth_score
+
+def score_wealth(df, group_column, weights=None):
+    """
+    Indicator aggregates and Total_Wealth_Score per group of any frame (computed live)
+    """
+    weights = {**WEIGHTS, **(weights or {})}
+    grouped = _aggregate(df, group_column)
+    wealth_score = _weighted_sum(grouped, weights)
+    if 'Poverty Rate (%)' in grouped.columns:
+        wealth_score = _apply_poverty_penalty(wealth_score, grouped['Poverty Rate (%)'].to_numpy(), weights)
+    grouped['Total_Wealth_Score'] = wealth_score
+    return grouped.drop(columns='Infrastructure')
+
+def build_score_table(dataset=None):
+    """
+    Aggregate every indicator at Region, Province and City level into one table
+    """
+    dataset = dataset or load_wealth_dataset()
+    frames = []
+    for depth, level in enumerate(LOCATION_COLUMNS, 1):
+        keys = LOCATION_COLUMNS[:depth]
+        grouped = _aggregate(dataset['table'], keys)
+        for col in LOCATION_COLUMNS[depth:]:
+            grouped[col] = 'All'
+        grouped['Level'] = level
+        # Within a level, rows are ordered by that level's name, as the page lists them
+        frames.append(grouped.sort_values([level] + keys, kind='mergesort'))
+
+    scores = pd.concat(frames, ignore_index=True)
+    scores['data_sha256'] = dataset['version']
+    return scores
+
+def write_score_table(scores, path=SCORES_PATH):
+    """
+    Atomically replace the stored score table
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    scores.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return path
+
+def _index_levels(scores):
+    # Per level: its rows with the location columns down to that level, and
+    # (region, province, city) with 'All' wildcards -> slice or positions in them
+    levels = {}
+    metrics = [col for col in ADDITIVE_METRICS + PERCENTAGE_METRICS + ['Infrastructure'] if col in scores.columns]
+    for depth, level in enumerate(LOCATION_COLUMNS, 1):
+        keys = LOCATION_COLUMNS[:depth]
+        level_rows = scores.loc[scores['Level'] == level, keys + metrics].reset_index(drop=True)
+        padding = ('All',) * (len(LOCATION_COLUMNS) - depth)
+        selections = {('All',) * len(LOCATION_COLUMNS): slice(0, len(level_rows))}
+        for rolled_up in itertools.product([False, True], repeat=depth):
+            group_keys = [col for col, rolled in zip(keys, rolled_up) if not rolled]
+            if not group_keys:
+                continue
+            for values, members in level_rows.groupby(group_keys, sort=False).indices.items():
+                values = iter(values if isinstance(values, tuple) else (values,))
+                selection = tuple('All' if rolled else next(values) for rolled in rolled_up) + padding
+                selections[selection] = as_slice(np.sort(members))
+        levels[level] = (level_rows, selections)
+    return levels
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _load_score_table(version, path=SCORES_PATH):
+    scores = pd.read_parquet(path) if os.path.exists(path) else None
+    if scores is None or scores.empty or scores['data_sha256'].iloc[0] != version:
+        scores = build_score_table()
+        try:
+            write_score_table(scores, path)
+        except OSError:
+            pass  # Read-only deployments keep the table in memory only
+    return _index_levels(scores)
+
+@st.cache_resource(show_spinner=False, max_entries=16)
+def _weighted_scores(version, weights):
+    # One vectorized column per level and set of weights; the aggregates are never recomputed
+    levels = _load_score_table(version)
+    return {level: _weighted_sum(level_rows, dict(weights)) for level, (level_rows, _) in levels.items()}
+
+def select_indicator(scores, indicator):
+    """
+    The location columns and one indicator from a score table ('All' keeps every column)
+    """
+    if indicator == 'All' or scores.empty:
+        return scores
+    if indicator not in scores.columns:
+        raise KeyError(indicator)
+    keys = [col for col in LOCATION_COLUMNS if col in scores.columns]
+    return scores[keys + [indicator]]
+
+def wealth_scores(scope, indicator='All', region='All', province='All', city='All', weights=None):
+    """
+    Scores for a region/province/city selection at a scope, for one indicator or 'All'
+
+    Rows carry the location columns down to the scope's level (City rows also name their
+    Province, so same-named municipalities stay apart).
+    """
+    weights = {**WEIGHTS, **(weights or {})}
+    level = SCOPE_COLUMNS.get(scope, 'City')
+    depth = LOCATION_COLUMNS.index(level) + 1
+    selection = (region, province, 'All' if city == 'N/A' else city)
+
+    if any(value != 'All' for value in selection[depth:]):
+        # Selection finer than the scope (a city viewed at province level): aggregate it live
+        df = wealth_selection(*selection)
+        if df.empty:
+            return pd.DataFrame()
+        return select_indicator(score_wealth(df, LOCATION_COLUMNS[:depth], weights), indicator)
+
+    version = load_wealth_dataset()['version']
+    level_rows, selections = _load_score_table(version)[level]
+    rows = selections.get(selection)
+    if rows is None:
+        return pd.DataFrame()
+
+    view = level_rows.iloc[rows].drop(columns='Infrastructure')
+    if indicator != 'All':
+        return select_indicator(view, indicator).reset_index(drop=True)
+
+    wealth_score = _weighted_scores(version, tuple(sorted(weights.items())))[level][rows]
+    if 'Poverty Rate (%)' in view.columns:
+        wealth_score = _apply_poverty_penalty(wealth_score, view['Poverty Rate (%)'].to_numpy(), weights)
+    return view.assign(Total_Wealth_Score=wealth_score).reset_index(drop=True)
+
+if __name__ == '__main__':
+    dataset = load_wealth_dataset()
+    scores = build_score_table(dataset)
+    path = write_score_table(scores)
+    counts = scores['Level'].value_counts()
+    print(f"Wrote {path}: " + ', '.join(f"{counts.get(level, 0)} {level}" for level in LOCATION_COLUMNS)
+          + f" rows for data {dataset['version'][:12]}")
@@ -0,0 +1,107 @@
+"""
+Local world country boundaries for the OFW remittance map.
+
+The Pop-Up Strategy page used to download folium's world-countries.json from
+GitHub on every rerun. The outlines now ship in data/ as a versioned
+GeoJSON built from Natural Earth's 1:110m admin-0 countries (already
+generalized for world-scale maps), with coordinates rounded to 0.001°.
+Country names follow the folium file the map used before (they label the
+tooltips); the remittance data joins on the ISO3 codes.
+
+The file is parsed once per process. Callers get a copy in which only the
+feature and properties dicts are new and the geometry is shared, so they can
+add tooltip properties without touching the cached data.
+
+Rebuild the asset from a Natural Earth admin-0 shapefile with:
+
+    python world_boundaries.py path/to/ne_110m_admin_0_countries.shp
+"""
+
+import os
+import sys
+import json
+
+import shapely
+import geopandas as gpd
+import streamlit as st
+
+WORLD_BOUNDARIES_VERSION = 'ne110m-v1'
+WORLD_BOUNDARIES_PATH = f'data/world_countries_{WORLD_BOUNDARIES_VERSION}.geojson'
+
+# Grid the coordinates are snapped to, in degrees
+COORDINATE_PRECISION = 0.001
+
+# Natural Earth short names -> names in folium's world-countries.json
+FOLIUM_NAMES = {
+    'Bahamas': 'The Bahamas',
+    'Bosnia and Herz.': 'Bosnia and Herzegovina',
+    'Central African Rep.': 'Central African Republic',
+    'Congo': 'Republic of the Congo',
+    'Czechia': 'Czech Republic',
+    "Côte d'Ivoire": 'Ivory Coast',
+    'Dem. Rep. Congo': 'Democratic Republic of the Congo',
+    'Dominican Rep.': 'Dominican Republic',
+    'Eq. Guinea': 'Equatorial Guinea',
+    'Falkland Is.': 'Falkland Islands',
+    'Fr. S. Antarctic Lands': 'French Southern and Antarctic Lands',
+    'Guinea-Bissau': 'Guinea Bissau',
+    'N. Cyprus': 'Northern Cyprus',
+    'North Macedonia': 'Macedonia',
+    'Palestine': 'West Bank',
+    'S. Sudan': 'South Sudan',
+    'Serbia': 'Republic of Serbia',
+    'Solomon Is.': 'Solomon Islands',
+    'Tanzania': 'United Republic of Tanzania',
+    'Timor-Leste': 'East Timor',
+    'W. Sahara': 'Western Sahara',
+    'eSwatini': 'Swaziland',
+}
+
+def build_world_boundaries(source, path=WORLD_BOUNDARIES_PATH):
+    """
+    Convert a Natural Earth admin-0 shapefile into the compact GeoJSON asset
+    """
+    world = gpd.read_file(source).to_crs('EPSG:4326')
+    name_column = 'name' if 'name' in world.columns else 'NAME'
+    iso_column = 'iso_a3' if 'iso_a3' in world.columns else 'ISO_A3'
+
+    world = gpd.GeoDataFrame({
+        'name': world[name_column].replace(FOLIUM_NAMES),
+        'iso_a3': world[iso_column],
+    }, geometry=shapely.set_precision(world.geometry.values, COORDINATE_PRECISION), crs='EPSG:4326')
+    world = world[~world.geometry.is_empty].sort_values('name')
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(world.__geo_interface__, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
+    return path
+
+@st.cache_resource(show_spinner=False)
+def _load_world(path, version):
+    with open(path, 'r', encoding='utf-8') as f:
+        geojson = json.load(f)
+
+    # Tooltip label per country, computed once
+    for feature in geojson['features']:
+        feature['properties']['country'] = f"Country: {feature['properties']['name']}"
+    return geojson
+
+def world_geojson():
+    """
+    A copy of the world outlines that is safe to modify (geometry is shared, not copied)
+    """
+    geojson = _load_world(WORLD_BOUNDARIES_PATH, WORLD_BOUNDARIES_VERSION)
+    return {
+        'type': 'FeatureCollection',
+        'features': [
+            {'type': 'Feature', 'properties': dict(feature['properties']), 'geometry': feature['geometry']}
+            for feature in geojson['features']
+        ],
+    }
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        sys.exit('usage: python world_boundaries.py path/to/ne_110m_admin_0_countries.shp')
+    path = build_world_boundaries(sys.argv[1])
+    print(f"Wrote {path} ({os.path.getsize(path) / 1e6:,.2f} MB)")